@@ -0,0 +1,81 @@
+'''Assets'''
+import os
+import pygame as pg
+
+
+class AssetCache:
+    """
+    Process-wide cache of converted images, keyed by file path and transform, so sprites
+    that are rebuilt every life (or spawned many times) share one set of Surfaces and
+    never touch the disk again. Cached Surfaces are shared and must not be drawn on.
+
+    Attributes:
+        images (dict): maps (path, size, alpha) to the converted Surface
+        atlas (Surface): the texture atlas packed by pack_atlas, if any
+    """
+    def __init__(self):
+        self.images = {}
+        self.atlas = None
+
+    def image(self, filename, size=None, alpha=True):
+        """
+        Returns the image at filename, loading and converting it on first use.
+
+        Args:
+            filename (str): path of the image
+            size (tuple): (width, height) to scale the image to, or None to keep its size
+            alpha (bool): convert with per-pixel alpha (convert_alpha) or without (convert)
+        """
+        key = (filename, size, alpha)
+        img = self.images.get(key)
+        if img is None:
+            if size is not None:
+                img = pg.transform.scale(self.image(filename, alpha=alpha), size)
+            else:
+                img = pg.image.load(filename)
+                img = img.convert_alpha() if alpha else img.convert()
+            self.images[key] = img
+        return img
+
+    def preload(self, folders, extension='.png'):
+        """
+        Loads every image with the given extension in a list of folders.
+        """
+        for folder in folders:
+            for name in sorted(os.listdir(folder)):
+                if name.endswith(extension):
+                    self.image(os.path.join(folder, name))
+
+    def pack_atlas(self, width=1024, max_size=256):
+        """
+        Packs the cached per-pixel alpha images no bigger than max_size into a single
+        atlas Surface (shelf packing, tallest first) and replaces them in the cache with
+        subsurfaces of the atlas.
+        """
+        keys = [key for key, img in self.images.items()
+                if key[2] and img.get_parent() is None and img.get_width() <= max_size and img.get_height() <= max_size]
+        keys.sort(key=lambda key: self.images[key].get_height(), reverse=True)
+        places = {}
+        x = y = shelf = 0
+        for key in keys:
+            w, h = self.images[key].get_size()
+            if x + w > width:
+                x, y, shelf = 0, y + shelf, 0
+            places[key] = pg.Rect(x, y, w, h)
+            x += w
+            shelf = max(shelf, h)
+        if not places:
+            return
+        self.atlas = pg.Surface((width, y + shelf), pg.SRCALPHA).convert_alpha()
+        self.atlas.fill((0, 0, 0, 0))
+        for key, rect in places.items():
+            self.atlas.blit(self.images[key], rect, special_flags=pg.BLEND_RGBA_MAX) #exact copy onto the empty atlas
+            self.images[key] = self.atlas.subsurface(rect)
+
+    def clear(self):
+        self.images.clear()
+        self.atlas = None
+
+
+#shared by every Game in the process
+assets = AssetCache()
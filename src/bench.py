@@ -0,0 +1,131 @@
+'''Headless simulation and frame-time benchmark
+
+Runs the game without a window, sound or menu, drives the player from a scripted
+input stream for a fixed number of ticks and prints per-phase frame timings and
+per-frame counters (blits, A* expansions...) as JSON:
+
+    python bench.py --ticks 1000 --mode 1 --script walk.json --out timings.json
+
+A script is a JSON list of {"tick": n, "keys": ["right", "up"]} entries; each entry
+holds its keys (pygame key names) from tick n until the next entry. Without a script
+the player walks in a square. Cutscenes (e.g. the battery dying) play out like in
+Game.run, with every wait for a key pressed right away.
+
+The game module imports the menus, so pygame-menu must be installed (see the README)
+even though the benchmark never shows a menu.
+'''
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+import argparse
+import json
+import random
+import sys
+import cv2
+import numpy as np
+import pygame as pg
+from settings import *
+from profiler import Profiler
+
+DEFAULT_SCRIPT = [{'tick': 0, 'keys': ['right']},
+                  {'tick': 60, 'keys': ['down']},
+                  {'tick': 120, 'keys': ['left']},
+                  {'tick': 180, 'keys': ['up']}]
+DEFAULT_SCRIPT_PERIOD = 240
+
+
+class KeyState:
+    """
+    Stands in for the sequence pg.key.get_pressed returns.
+    """
+    def __init__(self, pressed):
+        self.pressed = pressed
+
+    def __getitem__(self, key):
+        return key in self.pressed
+
+
+class ScriptedInput:
+    """
+    Replays a key script tick by tick in place of pg.key.get_pressed.
+
+    Attributes:
+        segments (list): (start tick, set of key codes) pairs sorted by tick
+        period (int): replay the script from the start every period ticks (None to hold
+            the last segment forever)
+        tick (int): the current tick
+    """
+    def __init__(self, script, period=None):
+        self.segments = sorted((entry['tick'], frozenset(pg.key.key_code(k) for k in entry['keys'])) for entry in script)
+        self.period = period
+        self.tick = 0
+
+    def __call__(self):
+        tick = self.tick % self.period if self.period else self.tick
+        pressed = frozenset()
+        for start, keys in self.segments:
+            if start > tick:
+                break
+            pressed = keys
+        return KeyState(pressed)
+
+
+def run(mode='1', ticks=1000, script=None, seed=0):
+    '''
+    Plays ticks frames of the game headless with a fixed time step. A frame is a
+    simulation tick, or a cutscene frame of the same length while the timeline plays.
+
+    Returns:
+        A dict with the run settings, how the run ended and the per-phase timings
+    '''
+    import main #imported late so the dummy SDL drivers are set first
+    random.seed(seed)
+    np.random.seed(seed)
+    cv2.setRNGSeed(seed)
+    pg.init()
+    g = main.Game(mode)
+    g.headless = True
+    g.profiler = Profiler(enabled=True) #keeps every frame, not just the last PROFILE_HISTORY
+    g.get_pressed = ScriptedInput(script, None) if script is not None else ScriptedInput(DEFAULT_SCRIPT, DEFAULT_SCRIPT_PERIOD)
+    g.new()
+    g.playing = True
+    g.won = False
+    played = 0
+    while played < ticks and g.playing:
+        if g.timeline.active:
+            #a cutscene pauses the simulation as in Game.run; nobody is at the keyboard
+            g.timeline.key_pressed()
+            g.timeline.update(g.dt * 1000)
+        else:
+            g.step()
+            g.get_pressed.tick += 1
+        g.draw()
+        played += 1
+    return {'mode': mode,
+            'ticks': played,
+            'monsters': len(g.monsters),
+            'ended': 'won' if g.won else ('died' if not g.playing else None),
+            'phases': g.profiler.report(),
+            'counters': g.profiler.count_report()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Headless Mazescape benchmark")
+    parser.add_argument("--ticks", type=int, default=1000)
+    parser.add_argument("--mode", type=str, default='1')
+    parser.add_argument("--script", type=str, default=None, help="JSON key script to replay")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=str, default=None, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script, 'rt') as f:
+            script = json.load(f)
+    result = run(args.mode, args.ticks, script, args.seed)
+    if args.out:
+        with open(args.out, 'wt') as f:
+            json.dump(result, f, indent=2)
+    else:
+        json.dump(result, sys.stdout, indent=2)
+        print()
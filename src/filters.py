@@ -1,6 +1,8 @@
+import threading
 import numpy as np
 import cv2
 import pygame as pg
+from random import randrange
 
 def make_blurry(image):
         return pg.surfarray.make_surface(cv2.GaussianBlur(image,(9,9),0))
@@ -16,4 +18,52 @@ def make_noisy(image):
 
         cv2.randn(img_cpy, m, s)
 
-        return pg.surfarray.make_surface(cv2.add(img_cpy, image))
\ No newline at end of file
+        return pg.surfarray.make_surface(cv2.add(img_cpy, image))
+
+
+class NoisePool:
+        """
+        A fixed ring of pre-generated noise frames that are added on top of whatever is
+        already drawn, so the static effect costs the same memory no matter how big the map is.
+        The noise is generated on a background thread so loading does not wait for it; each
+        draw turns at most one finished array into a frame, and draws nothing until the first
+        one is ready.
+
+        Attributes:
+                size (tuple): (width, height) of each noise frame, usually the screen size
+                frames (list): the noise Surfaces, meant to be blitted with BLEND_RGB_ADD
+                pending (list): noise arrays generated but not made into Surfaces yet
+        """
+        def __init__(self, size, count, sigma=80):
+                self.size = size
+                self.frames = []
+                self.pending = []
+                threading.Thread(target=self.generate, args=(count, sigma), daemon=True).start()
+
+        def generate(self, count, sigma):
+                for i in range(count):
+                        noise = np.zeros((self.size[0], self.size[1], 3), dtype=np.uint8)
+                        cv2.randn(noise, (0, 0, 0), (sigma, sigma, sigma)) #same noise make_noisy adds
+                        self.pending.append(noise)
+
+        def draw(self, surface, rect):
+                """
+                Adds a random frame, at a random wrap-around offset, over rect of surface.
+
+                Args:
+                        surface (Surface): the surface to add the noise to (usually the screen)
+                        rect (Rect): the area of surface to cover; at most self.size
+                """
+                if self.pending:
+                        self.frames.append(pg.surfarray.make_surface(self.pending.pop()).convert()) #surfaces are made on the main thread
+                if not self.frames:
+                        return
+                frame = self.frames[randrange(len(self.frames))]
+                w, h = self.size
+                ox, oy = randrange(w), randrange(h)
+                #tile the frame so its (ox, oy) pixel lands on rect.topleft
+                for x in (-ox, w - ox):
+                        for y in (-oy, h - oy):
+                                area = pg.Rect(rect.x + x, rect.y + y, w, h).clip(rect)
+                                if area.width and area.height:
+                                        surface.blit(frame, area, area.move(-rect.x - x, -rect.y - y), special_flags=pg.BLEND_RGB_ADD)
@@ -0,0 +1,71 @@
+'''Loading'''
+import sys
+import pygame as pg
+from settings import *
+
+
+class LoadingScreen:
+    """
+    Progress bar shown while a level loads. The main thread calls wait to keep the window
+    drawn and responsive while a worker thread runs its stages; stages running on either
+    thread report themselves with finish.
+
+    Attributes:
+        screen (Surface): the display surface
+        stages (list): the names of every stage
+        finished (list): the names of the stages done so far; the worker appends to it
+        font (Font): font of the stage caption
+    """
+    def __init__(self, screen, stages):
+        self.screen = screen
+        self.stages = list(stages)
+        self.finished = []
+        self.font = pg.font.SysFont('Arial', 20, True)
+        self.draw()
+
+    def finish(self, stage):
+        self.finished.append(stage)
+
+    def run(self, stage, function, *args):
+        """
+        Runs a stage on the main thread and shows it finished.
+        """
+        function(*args)
+        self.finish(stage)
+        self.draw()
+
+    def draw(self):
+        done = len(self.finished)
+        left = [stage for stage in self.stages if stage not in self.finished]
+        caption = 'Loading {}...'.format(', '.join(left)) if left else 'Ready'
+        self.screen.fill(BLACK)
+        bar = pg.Rect(0, 0, WIDTH//2, LOADING_BAR_HEIGHT)
+        bar.center = (WIDTH//2, HEIGHT//2)
+        pg.draw.rect(self.screen, LIGHTGREY, bar, 2)
+        filled = bar.inflate(-8, -8)
+        filled.width = filled.width * done // len(self.stages)
+        if filled.width > 0:
+            self.screen.fill(WHITE, filled)
+        text = self.font.render(caption, True, WHITE)
+        self.screen.blit(text, text.get_rect(midbottom=(bar.centerx, bar.top - 10)))
+        pg.display.flip()
+
+    def wait(self, future, clock):
+        """
+        Draws the progress until a concurrent.futures.Future is done; closing the window
+        quits meanwhile.
+
+        Returns:
+            The future's result (its exception is raised here)
+        """
+        shown = -1
+        while not future.done():
+            for event in pg.event.get():
+                if event.type == pg.QUIT:
+                    pg.quit()
+                    sys.exit()
+            if shown != len(self.finished):
+                shown = len(self.finished)
+                self.draw()
+            clock.tick(LOADING_FPS)
+        return future.result()
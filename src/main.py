@@ -1,5 +1,6 @@
 '''Tilemap game'''
 import sys
+from concurrent.futures import ThreadPoolExecutor
 import wave
 from os import path
 import pygame as pg
@@ -7,10 +8,15 @@ import menu
 from settings import *
 from sprites import *
 from tilemap import *
-import time
 from random import uniform, choice, randint
 import numpy as np
 from filters import *
+from pathing import FlowField, HierarchicalPathfinder, SearchEngine, PathService
+from mapbundle import load_bundle
+from profiler import Profiler
+from assets import assets
+from loading import LoadingScreen
+from timeline import Timeline, Wait, WaitForKey, Until, Call, Clear, Text, Typewriter, FadeTo
 
 class Game:
     """
@@ -21,11 +27,15 @@ class Game:
             screen (Surface): the screen for the game
             clock (Clock): clock to keep track of time
             folder (str): directory for this file
-            dt (milliseconds): the time increments 
+            dt (seconds): the fixed time increment of one simulation tick
+            sim_time (milliseconds): simulated time since the game started; timers use
+                it instead of the wall clock so fast-forwarded runs behave the same
+            time_scale (float): simulated seconds per real second (>1 fast-forwards)
+            alpha (float): how far rendering is between the last two simulation ticks
     
         Map Data:
             map (Map): represents the map of the maze
-            minimap (Surface): the minimap of the maze
+            minimap (Minimap): the minimap of the maze, drawn from the occupancy grid (mode '1')
             teleport_map (str): path to file that has dict of teleport locations 
         
         Maze Level Data:
@@ -48,14 +58,16 @@ class Game:
         self.animation_folder = path.join(self.game_folder, 'animation')
         self.map_folder = path.join(self.game_folder, 'maps')
         #set mode
-        self.mode = mode
-        self.minimap_name = 'extended_map.png' if mode == '1' else None
+        self.set_mode(mode)
 
-        #misc
-        self.transition=False
-        self.last_update_noise=pg.time.get_ticks()
-        self.fuzz=False
-     
+        #input and instrumentation; replaced by bench.py for headless runs
+        self.get_pressed = pg.key.get_pressed
+        self.profiler = Profiler(PROFILE, PROFILE_HISTORY)
+        self.headless = False
+
+        #fixed timestep simulation; the clock and the rest of the level state are reset by new
+        self.dt = 1 / SIM_FPS
+        self.time_scale = 1.0
 
         #tuning
         self.offset_x=1
@@ -63,36 +75,82 @@ class Game:
         
         self.load_data('extended_map.tmx', 'extended_map.txt', 'extended_map_tp.txt')
 
+    def set_mode(self, mode):
+        """
+        Switches the game mode for the next new(); nothing loaded depends on it.
+        """
+        self.mode = mode
+        self.show_minimap = mode == '1'
+
     def load_data(self, map_name, grid_name, tp_name):
         """
         Loads data for a specific game map level.
 
+        Loading runs in stages behind a progress screen. The graph and pathing stages
+        do not touch pygame, so they run on a worker thread while the main thread, which
+        owns the display, loads the map, the images, the lighting masks and the sounds.
+        The static noise is cosmetic and keeps generating on its own thread after the
+        level starts.
+
         Args:
             map_name (str): name of the map without the extension (e.g. 'research_map'). 
                 map_name is a .txt located in map subfolder of self.folder.
-            minimap_name (str): name of the minimap without the extension (e.g. 'research_minimap'). 
-                minimap_name is a .png located in map subfolder of self.folder.
+            grid_name (str): name of the occupancy grid (e.g. 'research_map.txt'), a .txt
+                located in map subfolder of self.folder. The minimap is drawn from it too.
             tp_name (str): name of the file without the extension (e.g. 'reserach_map_tp').
                 maps coordinates of teleport tiles to each other in pairs.
                 tp_name is a .txt located in map subfolder of self.folder.
         """
-        
-        self.map= TiledMap(path.join(self.map_folder, map_name))
-        self.map_img = self.map.make_map()
-        self.map_img2 = self.map_img
-        #self.noisy_map_img = noisy("gauss", pg.surfarray.array3d(self.map_img))
-        self.noisy_map_img = make_noisy(pg.surfarray.array3d(self.map_img))
-        self.map_rect = self.map_img.get_rect()
-        
-        with open(path.join(self.map_folder, tp_name), 'rt') as f:
-            #   destinations is a dict mapping each tilemap teleport coordinate to
-            #   the destination tilemap coordinate
-            self.destinations = eval(f.read())
-
-        self.grid= OccupancyGrid(self, path.join(self.map_folder, grid_name)) #down here because it needs destinations
-        self.graph = self.grid.make_graph()
-
-        #sounds
+        #screen-sized static added over the visible map while the monster is close
+        self.noise = NoisePool((WIDTH, HEIGHT), NOISE_POOL_SIZE)
+
+        loading = LoadingScreen(self.screen, ['map', 'graph', 'pathing', 'images', 'lighting', 'sounds'])
+        with ThreadPoolExecutor(max_workers=1) as worker:
+            graph = worker.submit(self.load_graph, path.join(self.map_folder, map_name),
+                                  path.join(self.map_folder, grid_name), path.join(self.map_folder, tp_name), loading)
+            loading.run('map', self.load_map, path.join(self.map_folder, map_name))
+            loading.run('images', self.load_images)
+            loading.run('lighting', Lighting.prebake, self, (int(WIDTH/2), int(HEIGHT/2)))
+            loading.run('sounds', self.load_sounds)
+            loading.wait(graph, self.clock)
+
+    def load_map(self, map_file):
+        self.map= TiledMap(map_file)
+        #the map is baked lazily in chunks around the camera instead of one map-sized surface
+        self.map_img = ChunkedMap(self.map)
+        self.map_rect = pg.Rect(0, 0, self.map.width, self.map.height)
+
+    def load_graph(self, map_file, grid_file, tp_file, loading):
+        """
+        The worker thread's stages: the map bundle, then the pathing structures built on its graph.
+        """
+        #grid, graph, teleports and map objects come from a compiled bundle that is
+        #rebuilt automatically whenever one of the source files changes
+        bundle = load_bundle(self, map_file, grid_file, tp_file)
+        #   destinations is a dict mapping each tilemap teleport coordinate to
+        #   the destination tilemap coordinate
+        self.destinations = bundle.destinations
+        self.map_objects = bundle.objects
+        self.grid= OccupancyGrid(self, grid=bundle.grid)
+        self.graph = bundle.graph
+        loading.finish('graph')
+
+        self.flow_field = FlowField(self.graph) if MONSTER_PATHING == 'flowfield' else None
+        self.hpa = HierarchicalPathfinder(self.graph) if MONSTER_PATHING == 'hpa' else None
+        self.search = SearchEngine(self.graph) if MONSTER_PATHING == 'astar' else None
+        self.spawns = SpawnSampler(self.graph)
+        self.wall_rects = self.grid.wall_rects() if WALLS_FROM_GRID else None
+        self.walls = None #built by the first new() and kept, walls never change
+        self.path_service = PathService(self.find_path) if PATH_WORKER and MONSTER_PATHING in ('astar', 'hpa') else None
+        loading.finish('pathing')
+
+    def load_images(self):
+        #images are loaded once per process and shared by every sprite
+        assets.preload([self.sprite_folder, self.animation_folder])
+        if ASSET_ATLAS:
+            assets.pack_atlas()
+
+    def load_sounds(self):
         self.wall_channel=pg.mixer.Channel(0)
         self.wall_sound=pg.mixer.Sound(WALL_THUD_SOUND)
         self.teleport_channel=pg.mixer.Channel(1)
@@ -100,45 +158,99 @@ class Game:
 
     def new(self):
         """
-        Initialize and setup a new maze level.
+        Initialize and setup a new maze level. Only the mutable level state is reset;
+        everything load_data made is reused, so a game kept between plays starts at once.
         """
+        #fixed timestep simulation
+        self.sim_time = 0
+        self.accumulator = 0
+        self.alpha = 1
+
+        #misc
+        self.transition=False
+        self.last_update_noise=self.sim_time
+        self.fuzz=False
+
+        if self.path_service is not None:
+            self.path_service.invalidate() #searches for the monsters of the last life
         #groups for drawing
         self.moving_sprites = pg.sprite.LayeredUpdates() 
         self.static_sprites = pg.sprite.LayeredUpdates()
         #other groups
-        self.walls = pg.sprite.Group()
+        build_walls = self.walls is None
+        if build_walls:
+            self.walls = pg.sprite.Group()
         self.teleports = pg.sprite.Group() 
         self.win = pg.sprite.Group() 
         self.threat = pg.sprite.Group()
         self.hearts= pg.sprite.Group()
+        self.swarm = MonsterSwarm(self)
+        self.monsters = []
         
-        for tile_object in self.map.tmxdata.objects:
+        for tile_object in self.map_objects:
             if tile_object.name == "player":
                 self.player = Player(self, tile_object.x, tile_object.y)
             if tile_object.name == "monster":
-                self.monster = Monster(self, tile_object.x, tile_object.y)
-            if tile_object.name == "wall":
+                self.monsters.append(Monster(self, tile_object.x, tile_object.y))
+            if tile_object.name == "wall" and build_walls and self.wall_rects is None:
                 Obstacle(self, tile_object.x, tile_object.y, tile_object.width, tile_object.height)
             if tile_object.name == "mirror":
                 Mirror(self, tile_object.x, tile_object.y, tile_object.width, tile_object.height, self.destinations)
             if tile_object.name == "pentagram":
                 self.goal=Pentagram(self, tile_object.x, tile_object.y, tile_object.width, tile_object.height)
 
+        if build_walls and self.wall_rects is not None:
+            for x, y, w, h in self.wall_rects:
+                Obstacle(self, x*TILESIZE, y*TILESIZE, w*TILESIZE, h*TILESIZE)
+
         self.camera = Camera(self.map.width, self.map.height)
 
+        #extra monsters on random free tiles away from the player, for stress tests
+        spawns = self.spawns.pool(self.player.pos/TILESIZE, MONSTER_BUBBLE_DISTANCE/TILESIZE)
+        while len(self.monsters) < MONSTER_COUNT:
+            spawn = self.spawns.sample(spawns)
+            if spawn is None: #map too small for the bubble, settle for any free tile
+                spawns = self.spawns.pool()
+                spawn = self.spawns.sample(spawns)
+            if spawn is None:
+                raise ValueError("the map has no free tile to spawn {} monsters on".format(MONSTER_COUNT))
+            c, r = spawn
+            self.monsters.append(Monster(self, c*TILESIZE, r*TILESIZE))
+
+        #static collision indexes so sprites only test the rects around them
+        if build_walls:
+            self.wall_index = SpatialHash(self.walls)
+        self.teleport_table = TeleportTable(self.teleports, self.map.width, self.map.height)
+        self.win_index = SpatialHash(self.win)
+
         #static sprites
         self.flashlight=Flashlight(self, int(WIDTH/2), int(HEIGHT/2))
         self.darkness=Darkness(self, int(WIDTH/2), int(HEIGHT/2))
-        if self.minimap_name != None:
-            self.minimap=Minimap(self, self.minimap_name)
+        self.lighting=Lighting(self, self.flashlight, self.darkness) #draws both in one blit
+        if self.show_minimap:
+            self.minimap=Minimap(self)
+            #markers are created after the minimap so they are drawn over it
+            if MINIMAP_PLAYER_MARKER:
+                MinimapMarker(self, self.minimap, self.player, MINIMAP_PLAYER_COLOR)
+            if MINIMAP_MONSTER_MARKERS:
+                for monster in self.monsters:
+                    MinimapMarker(self, self.minimap, monster, MINIMAP_MONSTER_COLOR)
         for i in range(int(PLAYERHEALTH/10)):
             Heart(self, 726-37*(2-i), 20)
         self.battery= Battery(self, 726, 52)
         self.draw_debug = False
-
-        self.teleport_list=[]
-        for tele in self.teleports:
-            self.teleport_list.append(tele)
+        self.timeline = Timeline(self) #cutscenes, the simulation pauses while one plays
+        self.profile_overlay = ProfileOverlay(self) if self.profiler.enabled else None
+
+        #dirty rectangle bookkeeping for draw
+        self.full_redraw = True
+        self.last_drawn = {}
+        self.last_camera = None
+        self.last_fuzz = False
+
+        if self.flow_field is not None:
+            self.flow_field.reference=None #force a rebuild for the new player location
+            self.flow_field.track(self.player.pos, wait=True) #the monsters need a field from the first tick
         
     def run(self):
         """
@@ -146,20 +258,97 @@ class Game:
         """
         #game loop set self.playing to False to end game
         self.playing = True
-        while self.playing:
-            self.dt = self.clock.tick(FPS) / 1000
+        self.accumulator = 0
+        self.over = False
+        self.clock.tick() #the time spent in the menu is not simulated
+        while self.playing or self.timeline.active:
+            elapsed = self.clock.tick(FPS)
+            if self.timeline.active:
+                #a cutscene pauses the simulation; frames where nothing changes draw nothing
+                self.cutscene_events()
+                self.timeline.update(elapsed)
+                self.accumulator = 0
+            else:
+                #the simulation advances in fixed ticks of self.dt however long the frame took;
+                #leftover time carries over and is used to interpolate the drawing
+                self.accumulator += elapsed / 1000 * self.time_scale
+                steps = 0
+                while self.accumulator >= self.dt and self.playing:
+                    if steps == int(MAX_SIM_STEPS * max(1, self.time_scale)):
+                        self.accumulator = 0 #too far behind, drop the rest instead of spiraling
+                        break
+                    self.step()
+                    self.accumulator -= self.dt
+                    steps += 1
+                    if self.timeline.active:
+                        break
+            if not self.playing and not self.timeline.active and not self.over:
+                self.over = True
+                self.losing_sequence() #plays as a cutscene, so the loop goes on to draw it
+            self.alpha = min(self.accumulator / self.dt, 1)
+            self.draw()
+
+    def step(self):
+        """
+        Runs a single simulation tick of self.dt seconds.
+        """
+        with self.profiler.section('events'):
             self.events()
+        with self.profiler.section('update'):
             self.update()
-            self.draw()
-        self.losing_sequence()
+        self.sim_time += self.dt * 1000
+
+    def advance(self, ticks):
+        """
+        Fast-forwards the simulation by a number of ticks without drawing, e.g. for tests
+        or training. Stops early if the game ends.
+
+        Returns:
+            The number of ticks that were run
+        """
+        for tick in range(ticks):
+            if not self.playing:
+                return tick
+            self.step()
+        self.alpha = 1
+        return ticks
 
     def quit_game(self):
         """
         Quits the Mazescape game
         """
+        self.save_profile()
         pg.quit()
         sys.exit()
 
+    def save_profile(self):
+        """
+        Writes the profile next to main.py if profiling is on; called on every way out of
+        the game (closing the window in game here, quitting from the menus in __main__).
+        """
+        if self.profiler.enabled:
+            self.profiler.dump(path.join(self.game_folder, PROFILE_DUMP))
+
+    def leave(self):
+        """
+        Ends the game without the losing sequence, for the pause and win menus' buttons.
+        """
+        if menu.state == menu.QUIT:
+            self.quit_game()
+        self.playing = False
+        self.over = True
+
+    def cutscene_events(self):
+        """
+        Catches the events while a cutscene plays: quitting, and key presses for the
+        steps waiting for one.
+        """
+        for event in pg.event.get():
+            if event.type == pg.QUIT:
+                self.quit_game()
+            if event.type == pg.KEYDOWN:
+                self.timeline.key_pressed()
+
     def events(self):
         """
         Catches all game-related events
@@ -170,29 +359,36 @@ class Game:
                 self.quit_game()
             if event.type == pg.KEYDOWN:
                 if event.key == pg.K_ESCAPE:
-                    menu.paused = True
-                    menu.pause_menu() #code gets stuck in this call until a button is pressed in the pause menu
+                    if not menu.pause_menu(): #code waits in this call until a button is pressed in the pause menu
+                        self.leave()
                     self.clock=pg.time.Clock()
+                    self.full_redraw = True #the menu was drawn over the game
                 if event.key == pg.K_h:
                     self.draw_debug = not self.draw_debug
+                if event.key == pg.K_p:
+                    self.toggle_profile()
                 if event.key == pg.K_o:
                     if self.flashlight.on:#turning off flashlight
                         self.darkness.on = True
-                        self.battery.duration-=pg.time.get_ticks()-self.battery.last_update
+                        self.battery.duration-=self.sim_time-self.battery.last_update
                         self.flashlight.on=False
                     else: #turning on flashlight
                         self.darkness.on = False
-                        self.battery.last_update=pg.time.get_ticks()
+                        self.battery.last_update=self.sim_time
                         self.flashlight.on=True
 
         #darkness condition
         if self.transition:
             self.darkness_transition(self.player)
-            self.kidnap(self.player)
 
         #   win condition
-        if pg.sprite.spritecollide(self.player, self.win, False, collide_hit_rect):
-            menu.win_menu()
+        if self.win_index.collide(self.player.hit_rect):
+            if self.headless:
+                self.won = True
+                self.playing = False
+            else:
+                menu.win_menu()
+                self.leave()
 
         #got hit condition
         hit=pg.sprite.spritecollide(self.player, self.threat, False, collide_hit2_rect)
@@ -201,7 +397,8 @@ class Game:
         
         #mirror
         self.portal(self.player)
-        self.portal(self.monster)
+        for monster in self.monsters:
+            self.portal(monster)
     
     def damage(self, sprite):
         sprite.health-=MONSTER_DAMAGE
@@ -226,67 +423,54 @@ class Game:
         sprite.direction=sprite.dir
 
     def darkness_transition(self, sprite):
-        for sprite in self.static_sprites:
-            self.screen.blit(sprite.image, sprite.rect)
-        self.draw_text_by_letter("Batteries died", pg.font.SysFont('Arial', 20, 'bold'), WHITE, self.screen, 130, HEIGHT-250, WORD_TIMESTEP)
-        self.draw_text_by_letter("...", pg.font.SysFont('Arial', 20, 'bold'), WHITE, self.screen, self.last_x, HEIGHT-250, 500)
-        self.draw_text_by_letter("you got lost.", pg.font.SysFont('Arial', 20, 'bold'), WHITE, self.screen, self.last_x, HEIGHT-250, WORD_TIMESTEP)
-        #self.draw_text("You got lost", pg.font.SysFont('Arial', 60, 'bold'), DARKRED, self.screen, self.camera.apply(self.player).centerx+10, self.camera.apply(self.player).centery)
-        while True:
-            for event in pg.event.get():
-                if event.type == pg.KEYDOWN:
-                    return
-    
-    def draw_text_by_letter(self, text, font, color, surface, x, y, speed):
-        last=pg.time.get_ticks()
-        while True:
-            now=pg.time.get_ticks()
-            if now-last>speed:
-                if len(text)>0:
-                    last=now
-                    letter_obj = font.render(text[0], True, color)
-                    letter_rect=letter_obj.get_rect()
-                    letter_rect.center=(x,y)
-                    surface.blit(letter_obj, letter_rect)
-                    pg.display.flip()
-                    if len(text)==1:
-                        self.last_x=letter_rect.x+letter_rect.width+10
-                    self.draw_text_by_letter(text[1:len(text)], font, color, surface, x+letter_rect.width+5, y, speed)
-                break
+        """
+        Plays the cutscene for the flashlight's batteries dying, then kidnaps the sprite.
+        """
+        self.transition=False
+        self.timeline.play(
+            Typewriter("Batteries died", (130, HEIGHT-250), WORD_TIMESTEP),
+            Typewriter("...", None, 500),
+            Typewriter("you got lost.", None, WORD_TIMESTEP),
+            WaitForKey(),
+            Clear(),
+            Call(self.kidnap, sprite))
 
     def kidnap(self, sprite):
-        while True:
-            possible_loc=(randint(0, self.grid.tile_width-1), randint(0, self.grid.tile_height-1))
-            if possible_loc in self.graph and distance(possible_loc, self.goal.pt)>20 and distance(possible_loc, (round(self.monster.pos[0]/TILESIZE), round(self.monster.pos[1]/TILESIZE)))>10:
-                sprite.pos.x=possible_loc[0]*TILESIZE
-                sprite.pos.y=possible_loc[1]*TILESIZE
-                sprite.hit_rect.centerx= int(sprite.pos.x)
-                sprite.hit_rect.centery= int(sprite.pos.y)
-                sprite.rect.center=sprite.hit_rect.center
-                sprite.pause_transition=1
-                sprite.pause=PLAYER_PAUSE_DURATION_KIDNAP
-                sprite.direction=sprite.dir
-                self.darkness.on=False
-                self.battery.kill()
-                self.clock=pg.time.Clock() #reset clock because there was prolonged waiting time from main game loop in transition
-                self.battery=Battery(self, 726, 52)
-                self.transition=False
-                self.damage(sprite)
-                return
+        pool=self.spawns.pool(self.goal.pt, KIDNAP_GOAL_DISTANCE)
+        avoid=self.swarm.tiles() if self.monsters else None
+        possible_loc=self.spawns.sample(pool, avoid, KIDNAP_MONSTER_DISTANCE)
+        if possible_loc is None: #monsters everywhere, settle for away from the goal
+            possible_loc=self.spawns.sample(pool)
+        if possible_loc is None: #map too small for the goal distance, settle for any free tile
+            possible_loc=self.spawns.sample(self.spawns.pool())
+        if possible_loc is None:
+            raise ValueError("the map has no free tile to drop the player on")
+        sprite.pos.x=possible_loc[0]*TILESIZE
+        sprite.pos.y=possible_loc[1]*TILESIZE
+        sprite.hit_rect.centerx= int(sprite.pos.x)
+        sprite.hit_rect.centery= int(sprite.pos.y)
+        sprite.rect.center=sprite.hit_rect.center
+        sprite.pause_transition=1
+        sprite.pause=PLAYER_PAUSE_DURATION_KIDNAP
+        sprite.direction=sprite.dir
+        self.darkness.on=False
+        self.battery.kill()
+        self.battery=Battery(self, 726, 52)
+        self.transition=False
+        self.damage(sprite)
 
     def portal(self, sprite):
         #   teleportation
-        tel_block_hit = pg.sprite.spritecollide(sprite, self.teleports, False)
-        if tel_block_hit:
+        table = self.teleport_table
+        hit = table.hit(sprite.rect)
+        if hit >= 0:
             #   Find the other teleport block
-            target=tel_block_hit
+            target = hit
             if sprite.name=='monster':
-                prob=[0.9 if (tele.tp_x==tel_block_hit[0].tp_x and tele.tp_y==tel_block_hit[0].tp_y)else 0.1/(len(self.teleport_list)-1) for tele in self.teleport_list]
-                target=np.random.choice(self.teleport_list, 1, p=prob)
+                target = table.choose(hit, np.random.random_sample())
             
-            destination_x, destination_y = target[0].tp_x, target[0].tp_y
-            sprite.pos.x = (destination_x+self.offset_x) * TILESIZE
-            sprite.pos.y = (destination_y+self.offset_y) * TILESIZE
+            destination_x, destination_y = table.destinations[target]
+            sprite.pos = vec((destination_x+self.offset_x) * TILESIZE, (destination_y+self.offset_y) * TILESIZE)
 
             sprite.hit_rect.centerx= int(sprite.pos.x)
             sprite.hit_rect.centery= int(sprite.pos.y)
@@ -301,11 +485,49 @@ class Game:
             if sprite.name=='monster':
                 sprite.generate_path()
 
+    def find_path(self, start, goal, previous=None):
+        """
+        Finds a monster path with the search pathing engine ('astar' or 'hpa').
+
+        Args:
+            start (tuple): node to start from
+            goal (tuple): node to reach
+            previous (list): the monster's last path, which A* may repair
+
+        Returns:
+            (nodes, cost, expanded) where nodes is the list of nodes from start towards goal,
+            cost the estimated cost of the whole path (None if nodes is the whole path) and
+            expanded the number of nodes A* expanded (0 for HPA*). This may run on the path
+            worker, so the caller records expanded with the profiler.
+        """
+        if self.hpa is not None:
+            return self.hpa.find_path(start, goal) + (0,)
+        expansions = self.search.expansions
+        nodes = self.search.find_path(start, goal, previous)
+        return nodes, None, self.search.expansions - expansions
+
+    def toggle_profile(self):
+        """
+        Turns profiling and its on-screen overlay on or off.
+        """
+        self.profiler.enabled = not self.profiler.enabled
+        if self.profiler.enabled:
+            self.profile_overlay = ProfileOverlay(self)
+        elif self.profile_overlay is not None:
+            self.profile_overlay.kill()
+            self.profile_overlay = None
+
     def update(self):
         """
-        Updates the frame of the game
+        Updates the game by one simulation tick
         """
+        for sprite in self.moving_sprites:
+            sprite.prev_center = sprite.rect.center #for interpolated drawing
+        if self.flow_field is not None:
+            with self.profiler.section('pathfinding'):
+                self.flow_field.track(self.player.pos) #rebuilds a slice per tick after the player changes tile
         self.moving_sprites.update() 
+        self.swarm.update() #moves every monster at once
         self.static_sprites.update()
         self.camera.update(self.player)
 
@@ -323,33 +545,43 @@ class Game:
         """
         Draws the given map level by layering all the sprites.
         """
-        pg.display.set_caption("{:.2f}".format(self.clock.get_fps()))
-
-        
+        self.profiler.begin('draw')
+        self.camera.interpolate(self.alpha)
 
-        if distance(self.player.pos, self.monster.pos)<MONSTER_BUBBLE_DISTANCE:
-            now=pg.time.get_ticks()
+        if self.swarm.nearest_distance(self.player.pos)<MONSTER_BUBBLE_DISTANCE:
+            now=self.sim_time
             if self.fuzz:
                 wait=NOISE_DURATION
             else:
                 wait=NOISE_TIMESTEP #change to a function of distance to monster
             if now - self.last_update_noise>wait:
                 self.last_update_noise=now
-                if self.fuzz:
-                    self.map_img2=self.map_img
-                else:
-                    self.map_img2=self.noisy_map_img
-                    #make static sound
+                #make static sound
                 self.fuzz=not self.fuzz
         else:
-            self.map_img2=self.map_img
             self.fuzz=False
 
-        self.screen.blit(self.map_img2, self.camera.apply_rect(self.map_rect))
+        #where every sprite lands on the screen this frame
+        drawn = {sprite: (sprite.image, self.camera.apply_rect(self.interpolated_rect(sprite))) for sprite in self.moving_sprites}
+        drawn.update((sprite, (sprite.image, pg.Rect(sprite.rect.topleft, sprite.image.get_size()))) for sprite in self.static_sprites)
+        dirty = self.dirty_rects(drawn)
+        if dirty == []: #nothing changed on screen
+            self.profiler.end('draw')
+            self.profiler.end_frame()
+            return
+        if dirty is not None:
+            self.screen.set_clip(dirty[0].unionall(dirty[1:])) #only redraw around what changed
+
+        blits = self.map_img.draw(self.screen, self.camera) + len(drawn)
+        if self.fuzz:
+            self.noise.draw(self.screen, self.camera.apply_rect(self.map_rect).clip(self.screen.get_rect()))
+            blits += 1
+        self.profiler.count('blits', blits)
+        self.profiler.count('dirty rects', 0 if dirty is None else len(dirty))
 
         #   Layer player and monsters on map
         for sprite in self.moving_sprites:
-            self.screen.blit(sprite.image, self.camera.apply(sprite))
+            self.screen.blit(*drawn[sprite])
             if self.draw_debug:
                 pg.draw.rect(self.screen, LIGHTBLUE, self.camera.apply_rect(sprite.hit_rect), 1)
         
@@ -360,63 +592,115 @@ class Game:
                 pg.draw.rect(self.screen, LIGHTBLUE, self.camera.apply_rect(mirror.rect), 1)
             for goal in self.win:
                 pg.draw.rect(self.screen, LIGHTBLUE, self.camera.apply_rect(goal.rect), 1)
-            dest=(self.monster.next_step[0]*TILESIZE, self.monster.next_step[1]*TILESIZE)
-            next_step=pg.Rect(0, 0, 20, 20)
-            next_step.center=dest
-            pg.draw.rect(self.screen, LIGHTBLUE, self.camera.apply_rect(next_step), 1)
+            for monster in self.monsters:
+                dest=(monster.next_step[0]*TILESIZE, monster.next_step[1]*TILESIZE)
+                next_step=pg.Rect(0, 0, 20, 20)
+                next_step.center=dest
+                pg.draw.rect(self.screen, LIGHTBLUE, self.camera.apply_rect(next_step), 1)
             
         for sprite in self.static_sprites:
-            self.screen.blit(sprite.image, sprite.rect)
-        pg.display.flip() #update the full display surface to the screen
+            self.screen.blit(*drawn[sprite])
+        self.screen.set_clip(None)
+        self.profiler.end('draw')
+        with self.profiler.section('flip'):
+            if dirty is None:
+                pg.display.flip() #update the full display surface to the screen
+            else:
+                pg.display.update(dirty)
+        self.profiler.end_frame()
 
-    def draw_text(self, text, font, color, surface, x, y): #use for narrative in end sequence
+    def dirty_rects(self, drawn):
         """
-        Draws text onto a given surface.
+        Finds the parts of the screen that changed since the last drawn frame.
 
         Args:
-            text (str): non-empty text to display
-            font (Font): the font to display the text in
-            surface (Surface): the surface to display text on
-            x (int): the top left x-coordinate for the text
-            y (int): the top left y-coordinate for the text
+            drawn (dict): maps each sprite to the (image, screen Rect) it is drawn with
+
+        Returns:
+            None if the whole screen has to be redrawn (the camera moved, the fuzz is on,
+            debug drawing, first frame), otherwise the list of screen Rects covering every
+            sprite whose image or position changed (empty if nothing changed)
+        """
+        full = (self.full_redraw or self.draw_debug or self.fuzz or self.last_fuzz
+                or self.camera.camera.topleft != self.last_camera)
+        last = self.last_drawn
+        self.last_drawn = drawn
+        self.last_camera = self.camera.camera.topleft
+        self.last_fuzz = self.fuzz
+        self.full_redraw = False
+        if full:
+            return None
+        rects = []
+        for sprite, (image, rect) in drawn.items():
+            old = last.get(sprite)
+            if old is None:
+                rects.append(rect)
+            elif old[1] != rect:
+                rects.append(rect)
+                rects.append(old[1])
+            elif old[0] is not image:
+                area = getattr(sprite, 'dirty_area', None) #only part of the image can change
+                rects.append(rect if area is None else area)
+        for sprite in last:
+            if sprite not in drawn: #killed since the last frame
+                rects.append(last[sprite][1])
+        return [rect.clip(self.screen.get_rect()) for rect in rects if rect.colliderect(self.screen.get_rect())]
+
+    def interpolated_rect(self, sprite):
+        """
+        Returns the sprite's rect moved self.alpha of the way from where it was at the
+        previous simulation tick to where it is now.
         """
-        text_obj = font.render(text, True, color)
-        text_rect = text_obj.get_rect()
-        text_rect.center = (x, y)
-        surface.blit(text_obj, text_rect)
+        rect = sprite.rect.copy()
+        prev = getattr(sprite, 'prev_center', None)
+        if prev is not None and self.alpha < 1:
+            dx, dy = rect.centerx - prev[0], rect.centery - prev[1]
+            if abs(dx) + abs(dy) <= CAMERA_SNAP_DISTANCE:
+                rect.center = (round(prev[0] + dx * self.alpha), round(prev[1] + dy * self.alpha))
+        return rect
 
     def beginning_sequence(self):
         pass
 
     def losing_sequence(self):
-        while len(self.hearts)>0:
+        """
+        Plays the cutscene for the player dying: the last hearts dissolve, "You died"
+        shows up over the player and the screen fades before going back to the menu.
+        """
+        def dissolve_hearts(ms):
+            self.sim_time += ms
             self.hearts.update()
-            self.screen.blit(self.map_img, self.camera.apply_rect(self.map_rect))
-            for sprite in self.moving_sprites:
-                self.screen.blit(sprite.image, self.camera.apply(sprite))
-            for sprite in self.static_sprites:
-                self.screen.blit(sprite.image, sprite.rect)
-            pg.display.flip()
-        self.draw_text("You died", pg.font.SysFont('Arial', 60, 'bold'), DARKRED, self.screen, self.camera.apply(self.player).centerx+10, self.camera.apply(self.player).centery)
-        pg.display.flip()
-        time.sleep(3)
-        menu.run_menu()
+
+        player = self.camera.apply(self.player)
+        self.timeline.play(
+            Until(lambda: len(self.hearts)==0, dissolve_hearts),
+            Text("You died", (player.centerx+10, player.centery), 60, DARKRED),
+            FadeTo(3000, BLACK, 0, 160))
 
     def attack_sequence(self):
         pass
 
+session = None #the game is kept between plays so the map, graph and sounds load once
+
 def run_game(mode):
-    #create game
-    g= Game(mode)
-    while True:
-        g.new()
-        g.beginning_sequence()
-        g.run()
-
-#   Music
-pg.init()
-pg.mixer.music.load(MAIN_MUSIC_FILE)
-pg.mixer.music.play(-1)
-#   Run Game
-menu.game_function = run_game
-menu.run_menu()
+    global session
+    #create game on the first play, then reuse it
+    if session is None:
+        session = Game(mode)
+    else:
+        session.set_mode(mode)
+    session.new()
+    session.beginning_sequence()
+    session.run() #returns to the menu once the game is over
+
+if __name__ == '__main__':
+    #   Music
+    pg.init()
+    pg.mixer.music.load(MAIN_MUSIC_FILE)
+    pg.mixer.music.play(-1)
+    #   Run Game
+    menu.game_function = run_game
+    menu.run_menu()
+    if session is not None:
+        session.save_profile() #quit from a menu rather than from the game window
+
@@ -0,0 +1,138 @@
+'''Map bundle'''
+import ast
+import hashlib
+import os
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+import numpy as np
+from tilemap import Graph, OccupancyGrid
+
+BUNDLE_VERSION = 1
+
+#an object from the TMX object layer (player, monster, wall, mirror, pentagram)
+MapObject = namedtuple('MapObject', ['name', 'x', 'y', 'width', 'height'])
+
+
+class MapBundle:
+    """
+    Everything Game.load_data needs about a level besides the tile images, compiled from
+    the .tmx, occupancy grid and teleport files into a single .npz file.
+
+    Attributes:
+        grid (ndarray): uint8 occupancy grid, 1 for walls
+        graph (Graph): the maze graph built from grid and the teleports
+        destinations (dict): maps each teleport tile to its destination tile
+        objects (list): MapObjects of the TMX object layer, in file order
+        checksum (str): checksum of the source files the bundle was built from
+    """
+    def __init__(self, grid, graph, destinations, objects, checksum):
+        self.grid = grid
+        self.graph = graph
+        self.destinations = destinations
+        self.objects = objects
+        self.checksum = checksum
+
+
+def source_checksum(filenames, extra=''):
+    '''
+    Returns a sha1 of the bundle format version, extra (e.g. tuning values the graph
+    depends on) and the contents of every source file.
+    '''
+    h = hashlib.sha1('{}:{}'.format(BUNDLE_VERSION, extra).encode())
+    for filename in filenames:
+        with open(filename, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def read_teleports(filename):
+    '''
+    Reads a teleport file (a dict literal mapping tile coordinates to tile coordinates)
+    without evaluating any code.
+    '''
+    with open(filename, 'rt') as f:
+        return ast.literal_eval(f.read())
+
+
+def read_objects(filename):
+    '''
+    Reads the object layers of a .tmx file into a list of MapObjects.
+    '''
+    objects = []
+    for obj in ET.parse(filename).getroot().iter('object'):
+        objects.append(MapObject(obj.get('name'), float(obj.get('x', 0)), float(obj.get('y', 0)),
+                                 float(obj.get('width', 0)), float(obj.get('height', 0))))
+    return objects
+
+
+def build_bundle(game, map_file, grid_file, tp_file, checksum):
+    '''
+    Parses the source files of a level into a MapBundle.
+    '''
+    destinations = read_teleports(tp_file)
+    grid = OccupancyGrid(game, grid_file)
+    graph = grid.make_graph(destinations)
+    return MapBundle(grid.grid, graph, destinations, read_objects(map_file), checksum)
+
+
+def save_bundle(bundle, filename):
+    '''
+    Writes a MapBundle to an uncompressed .npz file (replacing it atomically).
+    '''
+    tp = np.array([src + dst for src, dst in bundle.destinations.items()], dtype=np.int32).reshape(-1, 4)
+    tmp = filename + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f,
+                 checksum=np.array(bundle.checksum),
+                 grid=bundle.grid,
+                 nodes=bundle.graph.nodes,
+                 index=bundle.graph.index,
+                 offsets=bundle.graph.offsets,
+                 indices=bundle.graph.indices,
+                 teleports=tp,
+                 object_names=np.array([obj.name or '' for obj in bundle.objects], dtype=str),
+                 object_rects=np.array([obj[1:] for obj in bundle.objects], dtype=np.float64).reshape(-1, 4))
+    os.replace(tmp, filename)
+
+
+def read_bundle(filename):
+    '''
+    Reads a MapBundle written by save_bundle.
+    '''
+    with np.load(filename) as data:
+        graph = Graph(data['nodes'], data['index'], data['offsets'], data['indices'])
+        destinations = {(int(a), int(b)): (int(c), int(d)) for a, b, c, d in data['teleports'].tolist()}
+        objects = [MapObject(name or None, *rect) for name, rect in zip(data['object_names'].tolist(), data['object_rects'].tolist())]
+        return MapBundle(data['grid'], graph, destinations, objects, str(data['checksum']))
+
+
+def load_bundle(game, map_file, grid_file, tp_file):
+    '''
+    Loads the compiled bundle next to map_file, rebuilding it first if it is missing,
+    unreadable or was built from different source files.
+
+    Args:
+        game (Game): the game the level is loaded for (its teleport offsets shape the graph)
+        map_file (str): path to the .tmx map
+        grid_file (str): path to the occupancy grid .txt
+        tp_file (str): path to the teleport .txt
+
+    Returns:
+        A MapBundle
+    '''
+    checksum = source_checksum((map_file, grid_file, tp_file), (game.offset_x, game.offset_y))
+    filename = os.path.splitext(map_file)[0] + '.npz'
+    if os.path.exists(filename):
+        try:
+            bundle = read_bundle(filename)
+            if bundle.checksum == checksum:
+                return bundle
+        except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile):
+            pass #corrupt, truncated or old bundle, rebuild it
+    bundle = build_bundle(game, map_file, grid_file, tp_file, checksum)
+    try:
+        save_bundle(bundle, filename)
+    except OSError:
+        pass #read-only install; still play with the freshly built bundle
+    return bundle
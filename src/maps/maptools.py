@@ -0,0 +1,256 @@
+"""
+Map tools
+
+Converts maps between the text format (one character per tile, '1' for walls, every
+line a row) and black/white png images, and emits the TMX wall objects and the
+teleport list of a text map. Text maps are streamed a block of rows at a time and
+every block is converted with byte lookup tables, so maps of tens of thousands of
+tiles on a side never live in memory as Python strings. Reading a png is the
+exception: PIL decodes the whole image, one byte per pixel, before it is converted.
+The walls are merged by the game's own tilemap.merge_walls, which needs the whole
+map as one boolean per tile.
+
+The teleports command pairs the 'T' tiles in reading order, which is arbitrary: check
+the pairs by hand (or edit the _tp.txt) before shipping a map.
+
+    python maptools.py png --txt_path map.txt --out_file map.png
+    python maptools.py txt --png_path map.png --out_file map.txt --width 100 --height 78
+    python maptools.py walls --txt_path map.txt --out_file walls.xml
+    python maptools.py teleports --txt_path map.txt --out_file map_tp.txt
+"""
+import argparse
+import os
+import struct
+import sys
+import zlib
+from itertools import islice
+import numpy as np
+
+CHUNK_ROWS = 1024 #rows converted at a time
+WALL = ord('1')
+TELEPORT = ord('T')
+
+#text byte -> png pixel: walls are black, every other tile ('0', '.', 'P', 'G', 'T') is white path
+TXT_TO_WHITE = np.ones(256, dtype=bool)
+TXT_TO_WHITE[WALL] = False
+
+
+def read_rows(txt_path, chunk_rows=CHUNK_ROWS):
+    """
+    Yields the tiles of a text map as (rows, width) uint8 arrays of character codes,
+    chunk_rows rows at a time. Blank lines are skipped.
+    """
+    width = None
+    with open(txt_path, 'rb') as f:
+        while True:
+            lines = list(islice(f, chunk_rows))
+            if not lines:
+                return
+            lines = [line.rstrip(b'\r\n') for line in lines]
+            lines = [line for line in lines if line]
+            if not lines:
+                continue
+            if width is None:
+                width = len(lines[0])
+            if any(len(line) != width for line in lines):
+                raise ValueError("{} is not a rectangular map".format(txt_path))
+            yield np.frombuffer(b''.join(lines), dtype=np.uint8).reshape(len(lines), width)
+
+
+def png_chunk(f, kind, data):
+    f.write(struct.pack('>I', len(data)) + kind + data)
+    f.write(struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+
+def write_png(out_file, blocks):
+    """
+    Writes (rows, width) boolean blocks (True is white) to a 1 bit grayscale png,
+    compressing each block as it comes. The height is only known at the end, so the
+    header is written again then.
+
+    Returns:
+        (height, width) of the image
+    """
+    height, width = 0, 0
+    compressor = zlib.compressobj()
+    with open(out_file, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        png_chunk(f, b'IHDR', struct.pack('>IIBBBBB', 0, 0, 1, 0, 0, 0, 0))
+        for block in blocks:
+            height += len(block)
+            width = block.shape[1]
+            packed = np.packbits(block, axis=1)
+            scanlines = np.zeros((len(block), packed.shape[1] + 1), dtype=np.uint8) #filter byte 0 in front of every row
+            scanlines[:, 1:] = packed
+            data = compressor.compress(scanlines.tobytes())
+            if data:
+                png_chunk(f, b'IDAT', data)
+        png_chunk(f, b'IDAT', compressor.flush())
+        png_chunk(f, b'IEND', b'')
+        f.seek(8)
+        png_chunk(f, b'IHDR', struct.pack('>IIBBBBB', width, height, 1, 0, 0, 0, 0))
+    return height, width
+
+
+def txt_to_png(txt_path, out_file, scale=1.0, chunk_rows=CHUNK_ROWS):
+    """
+    Converts a text map to a png where the walls are black and the path is white.
+    Whole number scales are applied while streaming, other scales resize the finished
+    image with PIL.
+
+    Returns:
+        (height, width) of the map in tiles
+    """
+    repeat = int(scale) if scale >= 1 and scale == int(scale) else 1
+    blocks = (TXT_TO_WHITE[rows].repeat(repeat, axis=0).repeat(repeat, axis=1)
+              for rows in read_rows(txt_path, chunk_rows))
+    height, width = write_png(out_file, blocks)
+    if scale != repeat:
+        from PIL import Image
+        im = Image.open(out_file).convert('L')
+        im = im.resize((int(width * scale), int(height * scale)))
+        im.save(out_file)
+    return height // repeat, width // repeat
+
+
+def png_to_txt(png_path, out_file, threshold=127, width=None, height=None,
+               white_becomes='1', black_becomes='.', chunk_rows=CHUNK_ROWS):
+    """
+    Converts a png of a map to a text map, resized to width x height tiles (the image
+    size by default). Pixels brighter than threshold become white_becomes, the rest
+    black_becomes. PIL decodes and resizes the whole image in memory (one byte per
+    pixel); only the conversion and the text output go chunk_rows rows at a time.
+
+    Returns:
+        (height, width) of the map in tiles
+    """
+    from PIL import Image
+    Image.MAX_IMAGE_PIXELS = None #maps are big on purpose
+    img = Image.open(png_path, 'r')
+    if width is not None or height is not None:
+        img = img.resize((width or img.size[0], height or img.size[1]))
+    img = img.convert('L')
+    gray = np.asarray(img)
+
+    lut = np.full(256, ord(black_becomes), dtype=np.uint8)
+    lut[threshold + 1:] = ord(white_becomes)
+    with open(out_file, 'wb') as f:
+        for top in range(0, gray.shape[0], chunk_rows):
+            band = lut[gray[top:top + chunk_rows]]
+            lines = np.full((len(band), band.shape[1] + 1), ord('\n'), dtype=np.uint8)
+            lines[:, :-1] = band
+            f.write(lines.tobytes())
+    return gray.shape
+
+
+def wall_rects(txt_path, chunk_rows=CHUNK_ROWS):
+    """
+    Returns the walls of a text map as (x, y, width, height) tile rects, merged the same
+    way as the game's wall colliders (tilemap.merge_walls). Unlike the other commands
+    this needs the whole map in memory, as one boolean per tile.
+    """
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) #the game's modules
+    os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1') #tilemap imports pygame; keep its banner out of the output
+    from tilemap import merge_walls
+    walls = np.concatenate([rows == WALL for rows in read_rows(txt_path, chunk_rows)])
+    return merge_walls(walls)
+
+
+def teleports(txt_path, chunk_rows=CHUNK_ROWS):
+    """
+    Returns the teleport dict of a text map, pairing its 'T' tiles in reading order
+    (first with second, third with fourth...). The text format cannot say which
+    teleports belong together, so this pairing is arbitrary and usually differs from a
+    hand-authored one (research_map_tp.txt pairs its teleports differently); check the
+    pairs by hand before using them.
+    """
+    found = []
+    y = 0
+    for rows in read_rows(txt_path, chunk_rows):
+        r, c = np.nonzero(rows == TELEPORT)
+        found.extend(zip(c.tolist(), (r + y).tolist()))
+        y += len(rows)
+    if len(found) % 2:
+        raise ValueError("{} has an odd number of teleports".format(txt_path))
+    pairs = {}
+    for a, b in zip(found[::2], found[1::2]):
+        pairs[a] = b
+        pairs[b] = a
+    return pairs
+
+
+def write_walls(txt_path, out, tile_size=32, offset_x=0.0, offset_y=0.0, first_id=1):
+    """
+    Writes the merged walls of a text map as TMX <object name="wall"> lines, for the
+    objects layer of the map's .tmx file.
+
+    Returns:
+        the number of walls written
+    """
+    count = 0
+    for count, (x, y, w, h) in enumerate(wall_rects(txt_path), 1):
+        out.write(' <object id="{}" name="wall" x="{:g}" y="{:g}" width="{}" height="{}"/>\n'.format(
+            first_id + count - 1, (x + offset_x) * tile_size, (y + offset_y) * tile_size,
+            w * tile_size, h * tile_size))
+    return count
+
+
+def write_teleports(txt_path, out):
+    """
+    Writes the teleport dict of a text map in the _tp.txt format read by the game.
+    """
+    pairs = teleports(txt_path)
+    out.write('{ ' + ',\n  '.join('{}: {}'.format(a, b) for a, b in pairs.items()) + ' }\n')
+    return len(pairs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mazescape map tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    png = commands.add_parser("png", help="text map to png")
+    png.add_argument("--txt_path", type=str, required=True)
+    png.add_argument("--out_file", type=str, default="out.png")
+    png.add_argument("--scale", type=float, default=1.0)
+
+    txt = commands.add_parser("txt", help="png to text map")
+    txt.add_argument("--png_path", type=str, required=True)
+    txt.add_argument("--out_file", type=str, default="out.txt")
+    txt.add_argument("--threshold", type=int, default=127)
+    txt.add_argument("--width", type=int, default=None)
+    txt.add_argument("--height", type=int, default=None)
+    txt.add_argument("--white_becomes", type=str, default='1')
+    txt.add_argument("--black_becomes", type=str, default='.')
+
+    walls = commands.add_parser("walls", help="TMX wall objects of a text map")
+    walls.add_argument("--txt_path", type=str, required=True)
+    walls.add_argument("--out_file", type=str, default=None)
+    walls.add_argument("--tile_size", type=int, default=32)
+    walls.add_argument("--offset_x", type=float, default=0.0)
+    walls.add_argument("--offset_y", type=float, default=0.0)
+    walls.add_argument("--first_id", type=int, default=1)
+
+    tele = commands.add_parser("teleports", help="teleport list of a text map, paired in reading order (check by hand)")
+    tele.add_argument("--txt_path", type=str, required=True)
+    tele.add_argument("--out_file", type=str, default=None)
+
+    args = parser.parse_args(argv)
+    if args.command == "png":
+        print(txt_to_png(args.txt_path, args.out_file, args.scale))
+    elif args.command == "txt":
+        print(png_to_txt(args.png_path, args.out_file, args.threshold, args.width, args.height,
+                         args.white_becomes, args.black_becomes))
+    else:
+        out = open(args.out_file, 'w') if args.out_file else sys.stdout
+        try:
+            if args.command == "walls":
+                write_walls(args.txt_path, out, args.tile_size, args.offset_x, args.offset_y, args.first_id)
+            else:
+                write_teleports(args.txt_path, out)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,10 @@
 import argparse
-import numpy as np
-from PIL import Image
+from maptools import png_to_txt
 
 """
 Takes in png representation of map and converts it to the
 appropriate text file format
+(see maptools.py for the other map conversions)
 """
 
 # Read in arguments
@@ -18,20 +18,6 @@ parser.add_argument("--white_becomes", type=str, default='1')
 parser.add_argument("--black_becomes", type=str, default='.')
 args = parser.parse_args()
 
-# Read in image
-img = Image.open(args.png_path, 'r')
-img = img.resize((args.width, args.height))
-img = img.convert('L')
-
-# Threshold image
-img = img.point(lambda p: p > args.threshold)
-
-# Put in correct format
-arr = np.asarray(img.getdata()).reshape(
-        img.size[1], img.size[0])
-str_arr = arr.astype(str)
-str_arr[arr == 0] = args.black_becomes
-str_arr[arr == 1] = args.white_becomes
-
-# Write to file
-np.savetxt(args.out_file, str_arr, fmt='%s', delimiter='')
+# Convert to text
+png_to_txt(args.png_path, args.out_file, args.threshold, args.width, args.height,
+           args.white_becomes, args.black_becomes)
@@ -20,16 +20,29 @@ MODE = ['1']
 MENU_BACKGROUND_COLOR = LIGHTGREY
 WINDOW_SIZE = (WIDTH, HEIGHT)
 
+# Menu states: the menu shown, or what run_menu does next
+MAIN = 'main'
+PLAYING = 'playing'
+PAUSED = 'paused'
+WON = 'won'
+QUIT = 'quit'
+
+state = MAIN
+game_function = None
+
 clock = None
 
 # noinspection PyTypeChecker
 main_menu = None  # type: pygameMenu.Menu
 
 # noinspection PyTypeChecker
-surface = None  # type: pygame.SurfaceType
+pause_menu_ = None  # type: pygameMenu.Menu
 
-paused = False
-game_function = None
+# noinspection PyTypeChecker
+win_menu_ = None  # type: pygameMenu.TextMenu
+
+# noinspection PyTypeChecker
+surface = None  # type: pygame.SurfaceType
 
 
 # -----------------------------------------------------------------------------
@@ -45,28 +58,16 @@ def change_mode(value, color):
     MODE[0] = value[0]
 
 
-def play_function(game_function, mode):
+def set_state(new_state):
     """
-    Main game function.
-    :param mode: mode of the game
-    :type mode: list
-    :param font: Pygame font
-    :type font: pygame.font.FontType
-    :param test: Test method, if true only one loop is allowed
-    :type test: bool
+    Go to another menu state; the menu loop showing the current one returns.
+    :param new_state: MAIN, PLAYING, PAUSED, WON or QUIT
+    :type new_state: str
     :return: None
     """
-    # Define globals
-    global main_menu
+    global state
+    state = new_state
 
-    # Reset main menu and disable
-    # You also can set another menu, like a 'pause menu', or just use the same
-    # main_menu as the menu that will check all your input.
-    main_menu.disable()
-    print(MODE[0])
-    mode=MODE[0]
-    MODE[0]='1'
-    game_function(mode)
 
 def main_background():
     """
@@ -81,101 +82,37 @@ def no():
     pass
 
 
-def unpause(pause_menu):
-    global paused
-    paused = not paused
-    pause_menu.disable()
-
-
-def pause_menu():
-    pause_menu = pygameMenu.Menu(surface,
-                                bgfun=no,
-                                back_box=False,
-                                color_selected=DARKRED,
-                                font=pygameMenu.font.FONT_BEBAS,
-                                font_color=COLOR_BLACK,
-                                font_size=30,
-                                menu_alpha=100,
-                                menu_color_title=MENU_BACKGROUND_COLOR,
-                                menu_color = COLOR_WHITE,
-                                menu_height=int(WINDOW_SIZE[1] * 0.5),
-                                menu_width=int(WINDOW_SIZE[0] * 0.5),
-                                onclose=pygameMenu.events.DISABLE_CLOSE,
-                                option_shadow=False,
-                                title='Paused',
-                                window_height=WINDOW_SIZE[1],
-                                window_width=WINDOW_SIZE[0]
-                                )
-    pause_menu.add_button('Resume',  # When pressing return -> play(mode[0], font)
-                         unpause,
-                         pause_menu)
-    pause_menu.add_button('Quit', run_menu)
-
-    global paused
-    while paused:
-        # Tick
-        clock.tick(FPS)
-
-        # Main menu
-        pause_menu.mainloop()
-
-        # Flip surface
-        pygame.display.flip()
-
-
-def win_menu():
-    win_menu = pygameMenu.TextMenu(surface,
-                                bgfun=no,
-                                back_box=False,
-                                color_selected=DARKRED,
-                                font=pygameMenu.font.FONT_BEBAS,
-                                font_color=COLOR_BLACK,
-                                font_size=24,
-                                menu_alpha=100,
-                                font_size_title=30,
-                                font_title=pygameMenu.font.FONT_BEBAS,
-                                menu_color_title=MENU_BACKGROUND_COLOR,
-                                menu_color=COLOR_WHITE,
-                                menu_height=int(WINDOW_SIZE[1] * 0.5),
-                                menu_width=int(WINDOW_SIZE[0] * 0.5),
-                                onclose=pygameMenu.events.DISABLE_CLOSE,
-                                option_shadow=False,
-                                text_color=COLOR_BLACK,
-                                text_fontsize=20,
-                                text_align=pygameMenu.locals.ALIGN_CENTER,
-                                title='You Won!',
-                                window_height=WINDOW_SIZE[1],
-                                window_width=WINDOW_SIZE[0]
-                                )
-                                
-    win_menu.add_line("Congratulations!")
-    win_menu.add_line("You beat the game :)")
-    win_menu.add_button('Quit', run_menu)
-
+def show(menu, showing):
+    """
+    Shows a menu until one of its buttons leaves the state showing. The menu is only
+    redrawn when events come in, and waits for them without using the CPU meanwhile.
+    :param menu: Menu to show
+    :type menu: pygameMenu.Menu
+    :param showing: State the menu stands for
+    :type showing: str
+    :return: None
+    """
+    menu.enable()
+    events = []  # the first pass only draws the menu
     while True:
-        # Tick
-        clock.tick(FPS)
-
-        # Main menu
-        win_menu.mainloop()
+        if any(event.type == pygame.QUIT for event in events):
+            set_state(QUIT)
+        else:
+            menu.mainloop(events, disable_loop=True)
+        if state != showing:
+            return
+        events = [pygame.event.wait()] + pygame.event.get()
 
-        # Flip surface
-        pygame.display.flip()
 
-
-def run_menu():
+def build_menus():
     """
-    Main program.
-    :param test: Indicate function is being tested
-    :type test: bool
+    Creates the display and every menu. Called once, the menus are reused afterwards.
     :return: None
     """
-
-    # -------------------------------------------------------------------------
-    # Globals
-    # -------------------------------------------------------------------------
     global clock
     global main_menu
+    global pause_menu_
+    global win_menu_
     global surface
 
     # -------------------------------------------------------------------------
@@ -194,7 +131,6 @@ def run_menu():
     # -------------------------------------------------------------------------
 
     # Play menu
-    global game_function
     play_menu = pygameMenu.Menu(surface,
                                 bgfun=main_background,
                                 back_box=False,
@@ -213,10 +149,9 @@ def run_menu():
                                 window_height=WINDOW_SIZE[1],
                                 window_width=WINDOW_SIZE[0]
                                 )
-    play_menu.add_button('Start',  # When pressing return -> play(mode[0], font)
-                         play_function,
-                         game_function,
-                         MODE[0])
+    play_menu.add_button('Start',  # When pressing return -> play(mode[0])
+                         set_state,
+                         PLAYING)
     play_menu.add_selector('Select Mode',
                            [('1', GREEN),
                             ('2', YELLOW)],
@@ -273,30 +208,101 @@ def run_menu():
 
     main_menu.add_button('Play', play_menu)
     main_menu.add_button('About', about_menu)
-    main_menu.add_button('Quit', pygameMenu.events.EXIT)
+    main_menu.add_button('Quit', set_state, QUIT)
 
     # Configure main menu
     main_menu.set_fps(FPS)
 
-    # -------------------------------------------------------------------------
-    # Main loop
-    # -------------------------------------------------------------------------
-    while True:
+    # Pause menu, drawn over the game
+    pause_menu_ = pygameMenu.Menu(surface,
+                                  bgfun=no,
+                                  back_box=False,
+                                  color_selected=DARKRED,
+                                  font=pygameMenu.font.FONT_BEBAS,
+                                  font_color=COLOR_BLACK,
+                                  font_size=30,
+                                  menu_alpha=100,
+                                  menu_color_title=MENU_BACKGROUND_COLOR,
+                                  menu_color = COLOR_WHITE,
+                                  menu_height=int(WINDOW_SIZE[1] * 0.5),
+                                  menu_width=int(WINDOW_SIZE[0] * 0.5),
+                                  onclose=pygameMenu.events.DISABLE_CLOSE,
+                                  option_shadow=False,
+                                  title='Paused',
+                                  window_height=WINDOW_SIZE[1],
+                                  window_width=WINDOW_SIZE[0]
+                                  )
+    pause_menu_.add_button('Resume', set_state, PLAYING)
+    pause_menu_.add_button('Quit', set_state, MAIN)
+    pause_menu_.set_fps(FPS)
+
+    # Win menu, drawn over the game
+    win_menu_ = pygameMenu.TextMenu(surface,
+                                    bgfun=no,
+                                    back_box=False,
+                                    color_selected=DARKRED,
+                                    font=pygameMenu.font.FONT_BEBAS,
+                                    font_color=COLOR_BLACK,
+                                    font_size=24,
+                                    menu_alpha=100,
+                                    font_size_title=30,
+                                    font_title=pygameMenu.font.FONT_BEBAS,
+                                    menu_color_title=MENU_BACKGROUND_COLOR,
+                                    menu_color=COLOR_WHITE,
+                                    menu_height=int(WINDOW_SIZE[1] * 0.5),
+                                    menu_width=int(WINDOW_SIZE[0] * 0.5),
+                                    onclose=pygameMenu.events.DISABLE_CLOSE,
+                                    option_shadow=False,
+                                    text_color=COLOR_BLACK,
+                                    text_fontsize=20,
+                                    text_align=pygameMenu.locals.ALIGN_CENTER,
+                                    title='You Won!',
+                                    window_height=WINDOW_SIZE[1],
+                                    window_width=WINDOW_SIZE[0]
+                                    )
+    win_menu_.add_line("Congratulations!")
+    win_menu_.add_line("You beat the game :)")
+    win_menu_.add_button('Quit', set_state, MAIN)
+    win_menu_.set_fps(FPS)
 
-        # Tick
-        clock.tick(FPS)
 
-        # Paint background
-        main_background()
+def pause_menu():
+    """
+    Shows the pause menu over the game until a button is pressed.
+    :return: True to resume the game, False to leave it
+    :rtype: bool
+    """
+    set_state(PAUSED)
+    show(pause_menu_, PAUSED)
+    return state == PLAYING
+
 
-        # Application events
-        events = pygame.event.get()
-        for event in events:
-            if event.type == pygame.QUIT:
-                exit()
+def win_menu():
+    """
+    Shows the win menu over the game until its button is pressed.
+    :return: None
+    """
+    set_state(WON)
+    show(win_menu_, WON)
 
-        # Main menu
-        main_menu.mainloop(events)
 
-        # Flip surface
-        pygame.display.flip()
+def run_menu():
+    """
+    Main program: shows the main menu and runs game_function(mode) every time a game
+    is started, until the menu or the window is closed. Games return here when they
+    end, so nothing is re-entered.
+    :return: None
+    """
+    if main_menu is None:
+        build_menus()
+
+    while state != QUIT:
+        if state == PLAYING:
+            main_menu.disable()
+            game_function(MODE[0])
+            if state != QUIT:
+                set_state(MAIN)
+            main_menu.full_reset()  # back to the top menu
+        else:
+            show(main_menu, MAIN)
+    pygame.quit()
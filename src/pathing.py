@@ -0,0 +1,571 @@
+'''Pathing'''
+import heapq
+import math
+import threading
+import traceback
+import numpy as np
+from settings import *
+
+SQRT2=math.sqrt(2)
+
+
+def closest_free_square(graph, pos):
+    '''
+    Finds the graph node closest to a pixel position, looking at most 3 tiles away.
+    Returns the rounded tile of pos if there is no node around it.
+    '''
+    current=(pos[0]/TILESIZE, pos[1]/TILESIZE)
+    reference=(round(current[0]), round(current[1]))
+    best=None
+    best_d=float('inf')
+    for x_prime in range(-3,4):
+        for y_prime in range(-3,4):
+            possible_loc=(reference[0]+x_prime, reference[1]+y_prime)
+            if possible_loc in graph:
+                d=math.hypot(possible_loc[0]-current[0], possible_loc[1]-current[1])
+                if d<best_d:
+                    best, best_d = possible_loc, d
+    if best is None:
+        return reference
+    return best
+
+
+class FlowField:
+    """
+    A flow field over the maze graph pointing every node towards a single goal (the player).
+    It is built with one reverse Dijkstra from the goal and only rebuilt when the goal
+    changes tile, so any number of monsters can read their next step in O(1). The
+    Dijkstra runs on integer node ids with the edge costs precomputed, and a rebuild is
+    spread over several ticks (budget nodes settled per tick); the monsters keep following
+    the old field until the new one is done, so a rebuild never stalls a frame.
+
+    Attributes:
+        graph (Graph): the maze graph
+        xs, ys (list): column/row of each node id
+        radj (list): (node id, cost) of the edges leading into each node id
+        budget (int): nodes a rebuild settles per tick, 0 to rebuild in one go
+        goal (tuple): the node the field currently points to
+        reference (tuple): the rounded tile the goal was last computed from
+        cost (list): shortest distance (in tiles) from each node id to the goal
+        hops (list): number of steps left from each node id to the goal
+        next (list): the next node id on the shortest path to the goal, -1 if unreachable
+        pending (generator): the rebuild in progress, or None
+    """
+    def __init__(self, graph, budget=FLOW_FIELD_BUDGET):
+        self.graph=graph
+        self.xs=graph.nodes[:, 0].tolist()
+        self.ys=graph.nodes[:, 1].tolist()
+        offsets=graph.offsets.tolist()
+        indices=graph.indices.tolist()
+        self.radj=[[] for _ in self.xs]
+        for u in range(len(self.xs)):
+            for v in indices[offsets[u]:offsets[u+1]]:
+                self.radj[v].append((u, math.hypot(self.xs[v]-self.xs[u], self.ys[v]-self.ys[u])))
+        self.budget=budget
+        self.goal=None
+        self.reference=None
+        self.cost=[]
+        self.hops=[]
+        self.next=[]
+        self.pending=None
+        self.pending_goal=None
+
+    def track(self, pos, wait=False):
+        '''
+        Points the field at the node closest to a pixel position. Starts a rebuild only
+        if the position moved to another tile, then runs one tick of the rebuild in
+        progress (all of it if wait is set).
+
+        Returns:
+            True if the field changed
+        '''
+        reference=(round(pos[0]/TILESIZE), round(pos[1]/TILESIZE))
+        if reference!=self.reference:
+            self.reference=reference
+            goal=closest_free_square(self.graph, pos)
+            if goal in self.graph and goal!=(self.pending_goal if self.pending is not None else self.goal):
+                self.pending=self.build(self.graph.node_id(goal))
+                self.pending_goal=goal
+        return self.advance(wait)
+
+    def advance(self, wait=False):
+        '''
+        Runs one tick of the rebuild in progress (all of it if wait is set) and switches
+        to the new field once it is done.
+
+        Returns:
+            True if the field changed
+        '''
+        if self.pending is None:
+            return False
+        try:
+            next(self.pending)
+            while wait:
+                next(self.pending)
+        except StopIteration as done:
+            self.cost, self.hops, self.next = done.value
+            self.goal=self.pending_goal
+            self.pending=None
+            return True
+        return False
+
+    def build(self, goal):
+        '''
+        Runs the reverse Dijkstra from the goal node id as a generator that pauses after
+        every budget settled nodes.
+
+        Returns:
+            The (cost, hops, next) lists of the field, as the StopIteration value
+        '''
+        n=len(self.xs)
+        cost=[math.inf]*n
+        hops=[0]*n
+        nxt=[-1]*n
+        cost[goal]=0
+        nxt[goal]=goal #for when the monster reaches the player
+        queue=[(0, goal)]
+        settled=0
+        while queue:
+            d, node=heapq.heappop(queue)
+            if d>cost[node]:
+                continue #stale entry
+            step=hops[node]+1
+            for prev, edge in self.radj[node]:
+                val=d+edge
+                if val<cost[prev]:
+                    cost[prev]=val
+                    hops[prev]=step
+                    nxt[prev]=node
+                    heapq.heappush(queue, (val, prev))
+            settled+=1
+            if settled==self.budget:
+                settled=0
+                yield
+        return cost, hops, nxt
+
+    def next_step(self, node):
+        '''
+        Returns the next node on the way to the goal, or node itself if the goal
+        cannot be reached from it.
+        '''
+        i=self.graph.node_id(node)
+        if i<0 or not self.next or self.next[i]<0:
+            return node
+        j=self.next[i]
+        return (self.xs[j], self.ys[j])
+
+    def steps_left(self, node):
+        '''
+        Returns the number of steps between node and the goal (0 if unreachable).
+        '''
+        i=self.graph.node_id(node)
+        if i<0 or not self.hops:
+            return 0
+        return self.hops[i]
+
+
+class HierarchicalPathfinder:
+    """
+    Hierarchical pathfinding (HPA*) over the maze graph. The grid is cut into square
+    clusters; the middle of every run of edges crossing from one cluster to the next
+    is an entrance, teleports are shortcuts between clusters, and the distances between
+    the entrances of a cluster are precomputed. A query searches this small abstract
+    graph and only refines the first few abstract steps into tiles, so long chases
+    across the maze cost about the same as short ones.
+
+    Attributes:
+        graph (Graph): the maze graph
+        cluster_size (int): width/height of a cluster in tiles
+        xs, ys (list): column/row of each node id
+        adj (list): neighbor node ids of each node id
+        radj (list): node ids with an edge to each node id (teleports are one-way)
+        cluster (list): cluster id of each node id
+        entrances (dict): maps a cluster id to its abstract node ids
+        edges (dict): maps an abstract node id to a dict of {abstract node id: cost}
+    """
+    def __init__(self, graph, cluster_size=HPA_CLUSTER_SIZE):
+        self.graph=graph
+        self.cluster_size=cluster_size
+        self.xs=graph.nodes[:, 0].tolist()
+        self.ys=graph.nodes[:, 1].tolist()
+        offsets=graph.offsets.tolist()
+        indices=graph.indices.tolist()
+        self.adj=[indices[offsets[i]:offsets[i+1]] for i in range(len(self.xs))]
+        self.radj=[[] for _ in self.adj]
+        for u, neighbors in enumerate(self.adj):
+            for v in neighbors:
+                self.radj[v].append(u)
+        columns=-(-graph.tile_width//cluster_size)
+        self.cluster=[(y//cluster_size)*columns + x//cluster_size for x, y in zip(self.xs, self.ys)]
+        self.entrances={}
+        self.edges={}
+        self.build()
+
+    def cost(self, a, b):
+        return math.hypot(self.xs[a]-self.xs[b], self.ys[a]-self.ys[b])
+
+    def add_edge(self, a, b, cost):
+        for node in (a, b):
+            if node not in self.edges:
+                self.edges[node]={}
+                self.entrances.setdefault(self.cluster[node], []).append(node)
+        if cost<self.edges[a].get(b, float('inf')):
+            self.edges[a][b]=cost
+
+    def build(self):
+        '''
+        Finds the entrances and teleports and precomputes the intra-cluster distances.
+        '''
+        crossings={}
+        for u, neighbors in enumerate(self.adj):
+            for v in neighbors:
+                if abs(self.xs[u]-self.xs[v])>1 or abs(self.ys[u]-self.ys[v])>1:
+                    self.add_edge(u, v, self.cost(u, v)) #teleport
+                elif self.cluster[u]!=self.cluster[v]:
+                    crossings.setdefault((self.cluster[u], self.cluster[v]), []).append((u, v))
+
+        #one entrance in the middle of every run of crossings that touch on both sides of
+        #the border (only then is every crossing of the run connected to its entrance)
+        for pairs in crossings.values():
+            pairs.sort(key=lambda pair: (self.xs[pair[0]], self.ys[pair[0]], self.xs[pair[1]], self.ys[pair[1]]))
+            run=[pairs[0]]
+            for pair in pairs[1:]+[None]:
+                if pair is not None and all(node==last or node in self.adj[last] for node, last in zip(pair, run[-1])):
+                    run.append(pair)
+                    continue
+                u, v = run[len(run)//2]
+                self.add_edge(u, v, self.cost(u, v))
+                run=[pair]
+
+        #distances between the entrances of each cluster
+        for cluster, nodes in self.entrances.items():
+            for a in nodes:
+                dist, _ = self.search(a, cluster)
+                for b in nodes:
+                    if b!=a and b in dist:
+                        self.add_edge(a, b, dist[b])
+
+    def search(self, start, cluster, goal=None, reverse=False):
+        '''
+        Dijkstra (A* when goal is given) from start that never leaves cluster. With
+        reverse the edges are followed backwards, so dist holds the costs to start.
+
+        Returns:
+            (dist, parent) dicts keyed by node id
+        '''
+        dist={start:0}
+        parent={}
+        queue=[(0, 0, start)]
+        adj=self.radj if reverse else self.adj
+        while queue:
+            _, d, node=heapq.heappop(queue)
+            if d>dist[node]:
+                continue
+            if node==goal:
+                break
+            for neighbor in adj[node]:
+                if self.cluster[neighbor]!=cluster:
+                    continue
+                val=d+self.cost(node, neighbor)
+                if val<dist.get(neighbor, float('inf')):
+                    dist[neighbor]=val
+                    parent[neighbor]=node
+                    h=self.cost(neighbor, goal) if goal is not None else 0
+                    heapq.heappush(queue, (val+h, val, neighbor))
+        return dist, parent
+
+    def find_path(self, start, goal, refine=HPA_REFINE_STEPS):
+        '''
+        Finds a path between two (column, row) nodes.
+
+        Args:
+            start (tuple): the node to start from
+            goal (tuple): the node to reach
+            refine (int): how many abstract steps to turn into tiles
+
+        Returns:
+            (path, cost): the list of nodes from start along the way to goal (only the
+            refined part, so it may stop short of goal), and the estimated cost of the
+            whole path, which is inf (with path [start]) if goal cannot be reached
+        '''
+        s, g = self.graph.node_id(start), self.graph.node_id(goal)
+        if s<0 or g<0:
+            return [start], float('inf')
+        if s==g:
+            return [start], 0
+
+        #connect start and goal to the entrances of their clusters, on top of their own
+        #abstract edges if they are entrances or teleport ends themselves
+        start_dist, _ = self.search(s, self.cluster[s])
+        goal_dist, _ = self.search(g, self.cluster[g], reverse=True)
+        start_edges=dict(self.edges.get(s, {}))
+        for node in self.entrances.get(self.cluster[s], ()):
+            if node in start_dist and node!=s:
+                start_edges[node]=min(start_edges.get(node, float('inf')), start_dist[node])
+        if self.cluster[s]==self.cluster[g] and g in start_dist:
+            start_edges[g]=min(start_edges.get(g, float('inf')), start_dist[g])
+        to_goal={node:goal_dist[node] for node in self.entrances.get(self.cluster[g], ()) if node in goal_dist and node!=g}
+
+        #A* over the abstract graph
+        dist={s:0}
+        parent={}
+        queue=[(self.cost(s, g), 0, s)]
+        while queue:
+            _, d, node=heapq.heappop(queue)
+            if node==g:
+                break
+            if d>dist[node]:
+                continue
+            edges=start_edges if node==s else self.edges.get(node, {})
+            if node in to_goal:
+                edges=dict(edges)
+                edges[g]=min(edges.get(g, float('inf')), to_goal[node])
+            for neighbor, cost in edges.items():
+                val=d+cost
+                if val<dist.get(neighbor, float('inf')):
+                    dist[neighbor]=val
+                    parent[neighbor]=node
+                    heapq.heappush(queue, (val+self.cost(neighbor, g), val, neighbor))
+        if g not in dist:
+            return [start], float('inf')
+
+        abstract=[g]
+        while abstract[-1]!=s:
+            abstract.append(parent[abstract[-1]])
+        abstract.reverse()
+
+        #refine the first abstract steps into tiles
+        path=[s]
+        for a, b in list(zip(abstract, abstract[1:]))[:refine]:
+            if self.cluster[a]!=self.cluster[b] or b in self.adj[a] and self.cost(a, b)>1.5:
+                path.append(b) #crossing into the next cluster or teleporting
+                continue
+            _, local_parent = self.search(a, self.cluster[a], b)
+            segment=[b]
+            while segment[-1]!=a:
+                segment.append(local_parent[segment[-1]])
+            path.extend(reversed(segment[:-1]))
+        return [(self.xs[i], self.ys[i]) for i in path], dist[g]
+
+
+class SearchEngine:
+    """
+    A* over the maze graph on integer node ids. Costs, parents and visited marks live in
+    arrays allocated once for the whole graph (a search counter marks which entries are
+    current, so nothing is cleared between searches), the open list is a heapq with lazy
+    deletion and the heuristic is the octile distance, or the straight line distance if the
+    graph has teleport edges (an edge costs its straight length, so octile would overestimate
+    a path through a teleport). When the goal only moved a little the previous path is
+    repaired instead of searching again from scratch.
+
+    Attributes:
+        graph (Graph): the maze graph
+        xs, ys (list): column/row of each node id
+        adj (list): neighbor node ids of each node id
+        adj_cost (list): the cost of each edge in adj
+        g (list): cost from the start of the current search to each node
+        parent (list): parent node id of each node in the current search
+        seen (list): search number each node's g/parent belong to
+        closed (list): search number each node was expanded in
+        expanded (int): nodes expanded by the last search
+        expansions (int): nodes expanded by every search so far
+    """
+    def __init__(self, graph):
+        self.graph=graph
+        self.xs=graph.nodes[:, 0].tolist()
+        self.ys=graph.nodes[:, 1].tolist()
+        offsets=graph.offsets.tolist()
+        indices=graph.indices.tolist()
+        self.adj=[indices[offsets[i]:offsets[i+1]] for i in range(len(self.xs))]
+        self.radj=[[] for _ in self.adj]
+        for u, neighbors in enumerate(self.adj):
+            for v in neighbors:
+                self.radj[v].append(u)
+        self.adj_cost=[[math.hypot(self.xs[v]-self.xs[u], self.ys[v]-self.ys[u]) for v in neighbors] for u, neighbors in enumerate(self.adj)]
+        n=len(self.xs)
+        self.g=[0.0]*n
+        self.parent=[-1]*n
+        self.seen=[0]*n
+        self.closed=[0]*n
+        self.search_id=0
+        self.expanded=0
+        self.expansions=0
+        sources=np.repeat(np.arange(n), np.diff(graph.offsets))
+        teleports=bool((np.abs(graph.nodes[graph.indices]-graph.nodes[sources]).max(axis=1, initial=0)>1).any())
+        self.heuristic=self.euclidean if teleports else self.octile
+
+    def octile(self, a, b):
+        dx=abs(self.xs[a]-self.xs[b])
+        dy=abs(self.ys[a]-self.ys[b])
+        return max(dx, dy)+(SQRT2-1)*min(dx, dy)
+
+    def euclidean(self, a, b):
+        return math.hypot(self.xs[a]-self.xs[b], self.ys[a]-self.ys[b])
+
+    def search(self, start, goal, budget=None):
+        '''
+        A* between two node ids.
+
+        Args:
+            budget (int): give up after expanding this many nodes (None for no limit)
+
+        Returns:
+            The list of node ids from start to goal, or None if goal was not reached
+        '''
+        self.search_id+=1
+        sid=self.search_id
+        g, parent, seen, closed, adj, adj_cost = self.g, self.parent, self.seen, self.closed, self.adj, self.adj_cost
+        g[start]=0.0
+        parent[start]=-1
+        seen[start]=sid
+        heuristic=self.heuristic
+        queue=[(heuristic(start, goal), 0.0, start)]
+        expanded=0
+        while queue:
+            _, d, node=heapq.heappop(queue)
+            if closed[node]==sid:
+                continue #lazy deletion of outdated entries
+            if node==goal:
+                break
+            closed[node]=sid
+            expanded+=1
+            if budget is not None and expanded>budget:
+                self.expanded=expanded
+                self.expansions+=expanded
+                return None
+            for neighbor, cost in zip(adj[node], adj_cost[node]):
+                if closed[neighbor]==sid:
+                    continue
+                val=d+cost
+                if seen[neighbor]!=sid or val<g[neighbor]:
+                    seen[neighbor]=sid
+                    g[neighbor]=val
+                    parent[neighbor]=node
+                    heapq.heappush(queue, (val+heuristic(neighbor, goal), val, neighbor))
+        else:
+            self.expanded=expanded
+            self.expansions+=expanded
+            return None #goal cannot be reached
+        self.expanded=expanded
+        self.expansions+=expanded
+        path=[goal]
+        while path[-1]!=start:
+            path.append(parent[path[-1]])
+        path.reverse()
+        return path
+
+    def find_path(self, start, goal, previous=None):
+        '''
+        Finds a path between two (column, row) nodes, reusing the previous path when
+        the goal is still on it or only moved a few tiles from its end.
+
+        Args:
+            start (tuple): the node to start from
+            goal (tuple): the node to reach
+            previous (list): the last path returned for this searcher, or None
+
+        Returns:
+            The list of nodes from start to goal, or [start] if goal cannot be reached
+        '''
+        s, g = self.graph.node_id(start), self.graph.node_id(goal)
+        if s<0 or g<0:
+            return [start]
+        path=None
+        if previous and start in previous:
+            tail=[self.graph.node_id(node) for node in previous[previous.index(start):]]
+            if g in tail:
+                path=tail[:tail.index(g)+1]
+            elif self.octile(tail[-1], g)<=PATH_REPAIR_RADIUS:
+                segment=self.search(tail[-1], g, PATH_REPAIR_BUDGET)
+                if segment is not None:
+                    #drop any loop where the new segment doubles back over the old path: splice
+                    #at the earliest tail node the segment passes (segment[0] is tail[-1] itself)
+                    position={node:i for i, node in enumerate(tail)}
+                    i, j = min((position[node], j) for j, node in enumerate(segment) if node in position)
+                    path=tail[:i]+segment[j:]
+        if path is None:
+            path=self.search(s, g)
+        if path is None:
+            return [start]
+        return [(self.xs[i], self.ys[i]) for i in path]
+
+
+class PathService:
+    """
+    Runs path searches on a background thread so a long search never stalls a frame.
+    Every requester (a monster) has at most one pending request; a newer request
+    replaces it, and results for requests that were replaced or belong to an older
+    graph version are dropped instead of being delivered. A search that raises is
+    reported on stderr and dropped too, so the thread keeps serving the others.
+
+    Attributes:
+        find_path (function): find_path(start, goal, previous) -> result, run on the worker
+        version (int): the current graph version; invalidate() bumps it
+        pending (dict): maps a requester to its waiting (version, start, goal, previous)
+        results (dict): maps a requester to its finished (start, goal, result)
+    """
+    def __init__(self, find_path):
+        self.find_path=find_path
+        self.version=0
+        self.pending={}
+        self.results={}
+        self.lock=threading.Condition()
+        self.running=None #the requester whose search is running right now
+        self.thread=None
+
+    def submit(self, key, start, goal, previous=None):
+        '''
+        Queues a search for key, replacing any search key is still waiting for.
+        '''
+        with self.lock:
+            self.pending.pop(key, None) #move to the back of the queue
+            self.pending[key]=(self.version, start, goal, previous)
+            self.lock.notify()
+        if self.thread is None:
+            self.thread=threading.Thread(target=self.run, name='PathService', daemon=True)
+            self.thread.start()
+
+    def poll(self):
+        '''
+        Returns the finished results as a list of (key, start, goal, result).
+        '''
+        with self.lock:
+            results, self.results = self.results, {}
+        return [(key,)+result for key, result in results.items()]
+
+    def busy(self, key):
+        '''
+        Returns whether a search for key is waiting or running.
+        '''
+        with self.lock:
+            return key in self.pending or key==self.running
+
+    def invalidate(self):
+        '''
+        Drops every pending request and result, e.g. when the level or graph changes.
+        '''
+        with self.lock:
+            self.version+=1
+            self.pending.clear()
+            self.results.clear()
+
+    def run(self):
+        while True:
+            with self.lock:
+                while not self.pending:
+                    self.lock.wait()
+                key=next(iter(self.pending))
+                request=self.pending.pop(key)
+                self.running=key
+            version, start, goal, previous = request
+            try:
+                result=self.find_path(start, goal, previous)
+            except Exception:
+                traceback.print_exc() #the requester keeps its old result and may ask again
+                with self.lock:
+                    self.running=None
+                continue
+            with self.lock:
+                self.running=None
+                if version==self.version and key not in self.pending: #otherwise it is already stale
+                    self.results[key]=(start, goal, result)
@@ -0,0 +1,136 @@
+'''Profiler'''
+import json
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+import numpy as np
+
+_NULL = nullcontext()
+
+
+class Profiler:
+    """
+    Collects how long each named phase of a frame (events, update, draw...) takes and
+    counts per frame work (A* node expansions, blits...). Phases timed several times in
+    one frame are summed, counts are added up, and end_frame stores the frame's totals
+    in a ring buffer of the last frames. While disabled every call is a no-op.
+
+    Attributes:
+        enabled (bool): whether timings are collected
+        frames (deque): one dict per finished frame mapping phase name to seconds;
+            'frame' is the time since the previous end_frame
+        counts (deque): one dict per finished frame mapping counter name to its count
+        current (dict): the phase totals of the frame in progress
+        counting (dict): the counts of the frame in progress; only the main thread
+            counts (path worker results are counted when they are collected)
+    """
+    def __init__(self, enabled=False, history=None):
+        self.enabled = enabled
+        self.frames = deque(maxlen=history)
+        self.counts = deque(maxlen=history)
+        self.current = {}
+        self.counting = {}
+        self.started = {}
+        self.last_end = None
+
+    def begin(self, name):
+        if self.enabled:
+            self.started[name] = time.perf_counter()
+
+    def end(self, name):
+        if self.enabled:
+            elapsed = time.perf_counter() - self.started.pop(name)
+            self.current[name] = self.current.get(name, 0) + elapsed
+
+    def section(self, name):
+        """
+        Returns a context manager timing its body as phase name.
+        """
+        if not self.enabled:
+            return _NULL
+        return self._section(name)
+
+    @contextmanager
+    def _section(self, name):
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counting[name] = self.counting.get(name, 0) + n
+
+    def end_frame(self):
+        if not self.enabled:
+            self.last_end = None #the first frame after enabling has no length
+            return
+        now = time.perf_counter()
+        if self.last_end is not None:
+            self.current['frame'] = now - self.last_end
+        self.last_end = now
+        self.frames.append(self.current)
+        self.counts.append(self.counting)
+        self.current = {}
+        self.counting = {}
+
+    def report(self, percentiles=(50, 90, 95, 99)):
+        """
+        Summarizes the finished frames.
+
+        Returns:
+            A dict mapping each phase name to its mean, max and percentile times in
+            milliseconds; phases missing from a frame count as 0 for that frame
+        """
+        return self.summarize(self.frames, percentiles, 1000, '_ms')
+
+    def count_report(self, percentiles=(50, 90, 95, 99)):
+        """
+        Same as report for the counters, in counts per frame.
+        """
+        return self.summarize(self.counts, percentiles, 1, '')
+
+    @staticmethod
+    def summarize(frames, percentiles, scale, unit):
+        names = sorted({name for frame in frames for name in frame})
+        summary = {}
+        for name in names:
+            values = np.array([frame.get(name, 0) for frame in frames]) * scale
+            stats = {'mean' + unit: float(values.mean()), 'max' + unit: float(values.max())}
+            for p in percentiles:
+                stats['p{}{}'.format(p, unit)] = float(np.percentile(values, p))
+            summary[name] = stats
+        return summary
+
+    def summary_lines(self, last=60):
+        """
+        Returns short text lines with the frame rate, the mean phase times and the mean
+        counts over the last frames, for the on-screen overlay.
+        """
+        frames = list(self.frames)[-last:]
+        counts = list(self.counts)[-last:]
+        if not frames:
+            return ['profiling...']
+        lines = []
+        frame_times = [frame['frame'] for frame in frames if 'frame' in frame]
+        if frame_times:
+            mean = sum(frame_times) / len(frame_times)
+            lines.append('fps {:6.1f}  frame {:6.2f} ms'.format(1 / mean if mean else 0, mean * 1000))
+        names = sorted({name for frame in frames for name in frame} - {'frame'})
+        for name in names:
+            lines.append('{:<12} {:6.2f} ms'.format(name, sum(frame.get(name, 0) for frame in frames) * 1000 / len(frames)))
+        for name in sorted({name for frame in counts for name in frame}):
+            lines.append('{:<12} {:8.1f}'.format(name, sum(frame.get(name, 0) for frame in counts) / len(counts)))
+        return lines
+
+    def dump(self, filename):
+        """
+        Writes the summaries and every frame in the ring buffer to a JSON file.
+        """
+        data = {'phases': self.report(),
+                'counters': self.count_report(),
+                'frames': [dict({name: seconds * 1000 for name, seconds in frame.items()}, counts=counts)
+                           for frame, counts in zip(self.frames, self.counts)]}
+        with open(filename, 'w') as f:
+            json.dump(data, f, indent=1)
@@ -20,12 +20,15 @@ SPAWN_Y = 10 #default; shouldn't need bc the map should have a span location
 WIDTH = 768   # 24 tiles across
 HEIGHT = 512  # 16 tiles down
 FPS = 60
+SIM_FPS = 60 #fixed simulation ticks per second, independent of the render rate
+MAX_SIM_STEPS = 5 #most simulation ticks run per rendered frame before the simulation falls behind
 TITLE = "Mazescape"
 BGCOLOR = DARKGREY
 
 TILESIZE = 32
 GRIDWIDTH = WIDTH / TILESIZE
 GRIDHEIGHT = HEIGHT / TILESIZE
+CAMERA_SNAP_DISTANCE = 4*TILESIZE #camera jumps farther than this (teleports) are not interpolated
 
 #layers
 WALL_LAYER = 1
@@ -37,9 +40,36 @@ DARKNESS_LAYER = 2
 HEART_LAYER = 3
 BATTERY_LAYER = 3 
 MINIMAP_LAYER = 3
+PROFILE_LAYER = 4
+FADE_LAYER = 5
+CAPTION_LAYER = 6
+
+#map rendering
+CHUNK_SIZE = 16 #tiles per side of a baked map chunk
+CHUNK_CACHE_BYTES = 16*1024*1024 #memory cap for baked chunks of one map layer
+WALLS_FROM_GRID = True #collide against walls merged from the occupancy grid instead of the hand-drawn TMX wall objects
+SPATIAL_CELL_SIZE = 4*TILESIZE #cell size of the wall/mirror/goal collision index
+
+#loading
+LOADING_FPS = 30 #redraws per second of the loading screen while the worker thread loads
+LOADING_BAR_HEIGHT = 24
+
+#assets
+ASSET_ATLAS = False #pack the small sprite images into one texture atlas after preloading
 
 #minimap
 MINIMAP_LOCATION = (10, 10)
+MINIMAP_SIZE = (WIDTH//3, HEIGHT//3)
+MINIMAP_WALL_COLOR = WHITE
+MINIMAP_PATH_COLOR = BLACK
+MINIMAP_FOG = True #hide the tiles the player has not been near yet
+MINIMAP_FOG_COLOR = DARKGREY
+MINIMAP_REVEAL_RADIUS = 4 #tiles revealed around the player
+MINIMAP_PLAYER_MARKER = True
+MINIMAP_PLAYER_COLOR = GREEN
+MINIMAP_MONSTER_MARKERS = True
+MINIMAP_MONSTER_COLOR = RED
+MINIMAP_MARKER_SIZE = 4 #pixels per side of a marker
 
 #heart
 HEART_FILE = 'heart.png'
@@ -53,12 +83,15 @@ WALL_THUD_SOUND = 'sounds/thud.wav'
 TELEPORT_SOUND = 'sounds/teleport.wav'
 
 #animations
-ANIMATION_WALKING_SPEED = 10 #frames
-ANIMATION_FLICKER_SPEED = 5 #frames
+ANIMATION_WALKING_SPEED = 10 #simulation ticks
+ANIMATION_FLICKER_SPEED = 5 #simulation ticks
 NOISE_DURATION = 100
 NOISE_TIMESTEP=1000
-PLAYER_PAUSE_DURATION_TELEPORT = 60 #frames so 1 second
-PLAYER_PAUSE_DURATION_KIDNAP = 60 #frames so 1 second
+NOISE_POOL_SIZE = 4 #screen-sized noise frames kept for the monster fuzz effect
+PLAYER_PAUSE_DURATION_TELEPORT = 60 #simulation ticks so 1 second
+PLAYER_PAUSE_DURATION_KIDNAP = 60 #simulation ticks so 1 second
+KIDNAP_GOAL_DISTANCE = 20 #tiles between the goal and where a kidnapped player is dropped
+KIDNAP_MONSTER_DISTANCE = 10 #tiles between any monster and where a kidnapped player is dropped
 PLAYER_PAUSE_DURATION_HIT = 30 #0.5 seconds
 MONSTER_PAUSE_DURATION = 60
 WORD_TIMESTEP = 100
@@ -105,4 +138,17 @@ MONSTER_IMG_RIGHT_WALK1 = "monster_walk1_right.png"
 MONSTER_IMG_RIGHT_WALK2 = "monster_walk2_right.png"
 MONSTER_KNOCKBACK = 20
 MONSTER_BUBBLE_DISTANCE = 160
-
+MONSTER_COUNT = 1 #monsters beyond the ones placed in the map are spawned on random free tiles
+MONSTER_PATHING = 'astar' #'astar' searches per monster, 'flowfield' shares one field towards the player (pays off with many monsters), 'hpa' searches hierarchically
+HPA_CLUSTER_SIZE = 16 #tiles per side of an HPA* cluster
+HPA_REFINE_STEPS = 3 #abstract HPA* steps turned into tiles per search
+PATH_REPAIR_RADIUS = 4 #A* repairs the old path instead of searching again if the player moved at most this many tiles
+PATH_REPAIR_BUDGET = 200 #most nodes a path repair may expand before falling back to a full search
+PATH_WORKER = True #run searches on a background thread; monsters keep their old path meanwhile
+FLOW_FIELD_BUDGET = 500 #nodes a flow field rebuild settles per tick; monsters follow the old field meanwhile (0 rebuilds at once)
+
+#profiling
+PROFILE = False #collect frame timings from the start; 'p' toggles it and the overlay in game
+PROFILE_HISTORY = 600 #frames kept in the profiler's ring buffer
+PROFILE_OVERLAY_PERIOD = 15 #simulation ticks between overlay refreshes
+PROFILE_DUMP = 'profile.json' #written next to main.py on exit while profiling
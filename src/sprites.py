@@ -2,9 +2,10 @@
 import pygame as pg
 from settings import *
 import math
-import heapdict
+import numpy as np
 from os import path
-from tilemap import collide_hit_rect
+from pathing import closest_free_square
+from assets import assets
 vec = pg.math.Vector2
 
 def distance(p0, p1):
@@ -51,32 +52,32 @@ class Player(pg.sprite.Sprite):
         self.direction=None #used for flicker animations
         self.name="player"
         self.health=PLAYERHEALTH
-        self.dir = None #current direction of player
+        self.dir = "down" #current direction of player; starts facing down like its image
 
         #images
-        left_w1=pg.image.load(path.join(self.game.sprite_folder, PLAYER_IMG_LEFT_WALK1)).convert_alpha()
-        left_still=pg.image.load(path.join(self.game.sprite_folder, PLAYER_IMG_LEFT_STILL)).convert_alpha()
-        left_w2=pg.image.load(path.join(self.game.sprite_folder, PLAYER_IMG_LEFT_WALK2)).convert_alpha()
-        right_w1=pg.image.load(path.join(self.game.sprite_folder, PLAYER_IMG_RIGHT_WALK1)).convert_alpha()
-        right_still=pg.image.load(path.join(self.game.sprite_folder, PLAYER_IMG_RIGHT_STILL)).convert_alpha()
-        right_w2=pg.image.load(path.join(self.game.sprite_folder, PLAYER_IMG_RIGHT_WALK2)).convert_alpha()
-        up_w1=pg.image.load(path.join(self.game.sprite_folder, PLAYER_IMG_BACK_WALK1)).convert_alpha()
-        up_still=pg.image.load(path.join(self.game.sprite_folder, PLAYER_IMG_BACK_STILL)).convert_alpha()
-        up_w2=pg.image.load(path.join(self.game.sprite_folder, PLAYER_IMG_BACK_WALK2)).convert_alpha()
-        down_w1=pg.image.load(path.join(self.game.sprite_folder, PLAYER_IMG_FRONT_WALK1)).convert_alpha()
-        down_still=pg.image.load(path.join(self.game.sprite_folder, PLAYER_IMG_FRONT_STILL)).convert_alpha()
-        down_w2=pg.image.load(path.join(self.game.sprite_folder, PLAYER_IMG_FRONT_WALK2)).convert_alpha()      
+        left_w1=assets.image(path.join(self.game.sprite_folder, PLAYER_IMG_LEFT_WALK1))
+        left_still=assets.image(path.join(self.game.sprite_folder, PLAYER_IMG_LEFT_STILL))
+        left_w2=assets.image(path.join(self.game.sprite_folder, PLAYER_IMG_LEFT_WALK2))
+        right_w1=assets.image(path.join(self.game.sprite_folder, PLAYER_IMG_RIGHT_WALK1))
+        right_still=assets.image(path.join(self.game.sprite_folder, PLAYER_IMG_RIGHT_STILL))
+        right_w2=assets.image(path.join(self.game.sprite_folder, PLAYER_IMG_RIGHT_WALK2))
+        up_w1=assets.image(path.join(self.game.sprite_folder, PLAYER_IMG_BACK_WALK1))
+        up_still=assets.image(path.join(self.game.sprite_folder, PLAYER_IMG_BACK_STILL))
+        up_w2=assets.image(path.join(self.game.sprite_folder, PLAYER_IMG_BACK_WALK2))
+        down_w1=assets.image(path.join(self.game.sprite_folder, PLAYER_IMG_FRONT_WALK1))
+        down_still=assets.image(path.join(self.game.sprite_folder, PLAYER_IMG_FRONT_STILL))
+        down_w2=assets.image(path.join(self.game.sprite_folder, PLAYER_IMG_FRONT_WALK2))      
         self.img_map={'left':{0:left_w1, 1:left_still, 2:left_w2},
                     'right':{0:right_w1, 1:right_still, 2:right_w2},
                     'up':{0:up_w1, 1:up_still, 2:up_w2},
                     'down':{0:down_w1, 1:down_still, 2:down_w2}}
 
         #teleport images
-        teleport_back=pg.image.load(path.join(self.game.sprite_folder, PLAYER_TELEPORT_BACK_STILL)).convert_alpha()
-        hurt_right=pg.image.load(path.join(self.game.sprite_folder, PLAYER_HURT_RIGHT)).convert_alpha()
-        hurt_left=pg.image.load(path.join(self.game.sprite_folder, PLAYER_HURT_LEFT)).convert_alpha()
-        hurt_up=pg.image.load(path.join(self.game.sprite_folder, PLAYER_HURT_UP)).convert_alpha()
-        hurt_down=pg.image.load(path.join(self.game.sprite_folder, PLAYER_HURT_DOWN)).convert_alpha()
+        teleport_back=assets.image(path.join(self.game.sprite_folder, PLAYER_TELEPORT_BACK_STILL))
+        hurt_right=assets.image(path.join(self.game.sprite_folder, PLAYER_HURT_RIGHT))
+        hurt_left=assets.image(path.join(self.game.sprite_folder, PLAYER_HURT_LEFT))
+        hurt_up=assets.image(path.join(self.game.sprite_folder, PLAYER_HURT_UP))
+        hurt_down=assets.image(path.join(self.game.sprite_folder, PLAYER_HURT_DOWN))
         self.flicker_map={0:{0:teleport_back, 1:up_still}, 1:{'right':{0:hurt_right, 1:right_still}, 
         'left':{0:hurt_left, 1:left_still}, 
         'up':{0:hurt_up, 1:up_still}, 
@@ -93,7 +94,7 @@ class Player(pg.sprite.Sprite):
 
     def get_keys(self):
         self.vel = vec(0, 0)
-        keys=pg.key.get_pressed()
+        keys=self.game.get_pressed()
         self.frame_counter+=1
         if self.frame_counter%10==0: #every 10 frames
             self.image_counter+=1
@@ -131,7 +132,7 @@ class Player(pg.sprite.Sprite):
         moving_against_wall=False
 
         if dir == "x":
-            hits = pg.sprite.spritecollide(self, self.game.walls, False, collide_hit_rect)
+            hits = self.game.wall_index.collide(self.hit_rect)
             if hits:
                 if hits[0].rect.centerx > self.hit_rect.centerx: #if moving to the right during collision
                     moving_against_wall=True
@@ -143,7 +144,7 @@ class Player(pg.sprite.Sprite):
                 self.hit_rect.centerx = self.pos.x
 
         if dir == "y": #analgous to x case
-            hits = pg.sprite.spritecollide(self, self.game.walls, False, collide_hit_rect)
+            hits = self.game.wall_index.collide(self.hit_rect)
             if hits:
                 if hits[0].rect.centery > self.hit_rect.centery: #if moving down during collision
                     moving_against_wall=True
@@ -171,10 +172,11 @@ class Player(pg.sprite.Sprite):
         self.pos += self.vel * self.game.dt
         self.rect=self.image.get_rect()
         self.rect.center = self.pos
-        self.hit_rect.centerx = self.pos.x
-        self.collide_wall('x')
-        self.hit_rect.centery = self.pos.y
-        self.collide_wall('y') 
+        with self.game.profiler.section('collision'):
+            self.hit_rect.centerx = self.pos.x
+            self.collide_wall('x')
+            self.hit_rect.centery = self.pos.y
+            self.collide_wall('y') 
         self.rect.center = self.hit_rect.center
 
     def draw_health(self):
@@ -203,32 +205,41 @@ class Player(pg.sprite.Sprite):
                 
         
 class Monster(pg.sprite.Sprite):
-    
+    """
+    Represents a monster chasing the player. Its position, velocity, path target and
+    timers live in a row of game.swarm, which moves every monster at once.
+
+    Attributes:
+        game (Game): the game the Monster is part of
+        swarm (MonsterSwarm): the swarm holding the monster's state
+        index (int): the row of the monster in the swarm arrays
+        image (Surface): the image of the Monster sprite
+        rect (Rect): a Rect object representing the Monster sprite
+        hit_rect (Rect): the Rect used for collisions
+        path (dict): the A* path, mapping each node to the next one (unused with a flow field)
+    """
     def __init__(self, game, x, y):
         self._layer=MONSTER_LAYER
         self.groups = game.moving_sprites, game.threat
         pg.sprite.Sprite.__init__(self, self.groups)
         self.game = game
-        self.vel = vec(0, 0)
-        self.pos = vec(x, y) 
-        self.counter=0
-        self.step=1
+        self.swarm = game.swarm
+        self.index = self.swarm.add(self, x, y)
         self.name="monster"
-        self.pause=0
 
         #images
-        left_w1=pg.image.load(path.join(self.game.sprite_folder, MONSTER_IMG_LEFT_WALK1)).convert_alpha()
-        left_still=pg.image.load(path.join(self.game.sprite_folder, MONSTER_IMG_LEFT_STILL)).convert_alpha()
-        left_w2=pg.image.load(path.join(self.game.sprite_folder, MONSTER_IMG_LEFT_WALK2)).convert_alpha()
-        right_w1=pg.image.load(path.join(self.game.sprite_folder, MONSTER_IMG_RIGHT_WALK1)).convert_alpha()
-        right_still=pg.image.load(path.join(self.game.sprite_folder, MONSTER_IMG_RIGHT_STILL)).convert_alpha()
-        right_w2=pg.image.load(path.join(self.game.sprite_folder, MONSTER_IMG_RIGHT_WALK2)).convert_alpha()
-        up_w1=pg.image.load(path.join(self.game.sprite_folder, MONSTER_IMG_BACK_WALK1)).convert_alpha()
-        up_still=pg.image.load(path.join(self.game.sprite_folder, MONSTER_IMG_BACK_STILL)).convert_alpha()
-        up_w2=pg.image.load(path.join(self.game.sprite_folder, MONSTER_IMG_BACK_WALK2)).convert_alpha()
-        down_w1=pg.image.load(path.join(self.game.sprite_folder, MONSTER_IMG_FRONT_WALK1)).convert_alpha()
-        down_still=pg.image.load(path.join(self.game.sprite_folder, MONSTER_IMG_FRONT_STILL)).convert_alpha()
-        down_w2=pg.image.load(path.join(self.game.sprite_folder, MONSTER_IMG_FRONT_WALK2)).convert_alpha()
+        left_w1=assets.image(path.join(self.game.sprite_folder, MONSTER_IMG_LEFT_WALK1))
+        left_still=assets.image(path.join(self.game.sprite_folder, MONSTER_IMG_LEFT_STILL))
+        left_w2=assets.image(path.join(self.game.sprite_folder, MONSTER_IMG_LEFT_WALK2))
+        right_w1=assets.image(path.join(self.game.sprite_folder, MONSTER_IMG_RIGHT_WALK1))
+        right_still=assets.image(path.join(self.game.sprite_folder, MONSTER_IMG_RIGHT_STILL))
+        right_w2=assets.image(path.join(self.game.sprite_folder, MONSTER_IMG_RIGHT_WALK2))
+        up_w1=assets.image(path.join(self.game.sprite_folder, MONSTER_IMG_BACK_WALK1))
+        up_still=assets.image(path.join(self.game.sprite_folder, MONSTER_IMG_BACK_STILL))
+        up_w2=assets.image(path.join(self.game.sprite_folder, MONSTER_IMG_BACK_WALK2))
+        down_w1=assets.image(path.join(self.game.sprite_folder, MONSTER_IMG_FRONT_WALK1))
+        down_still=assets.image(path.join(self.game.sprite_folder, MONSTER_IMG_FRONT_STILL))
+        down_w2=assets.image(path.join(self.game.sprite_folder, MONSTER_IMG_FRONT_WALK2))
         self.img_map={'left':{0:left_w1, 1:left_still, 2:left_w2},
                     'right':{0:right_w1, 1:right_still, 2:right_w2},
                     'up':{0:up_w1, 1:up_still, 2:up_w2},
@@ -237,185 +248,257 @@ class Monster(pg.sprite.Sprite):
         self.image = down_still
         self.rect = self.image.get_rect()
         self.rect.center=(x,y)
-        self.hit_rect=MONSTER_HIT_RECT
+        self.hit_rect=MONSTER_HIT_RECT.copy() #every monster needs its own
         self.hit_rect.center = self.rect.center
 
         #path
         self.path={}
-        self.next_step=()
+        self.path_nodes=[] #the A* path as a list, reused by the next search
+        self.path_goal=None #goal of the HPA* path
+        self.path_estimate=0 #estimated length of the HPA* path
 
-        #buttons
-        self.left=False
-        self.right=False
-        self.up=False
-        self.down=False
+    #state stored in the swarm arrays
+    @property
+    def pos(self):
+        return vec(*self.swarm.pos[self.index].tolist())
 
+    @pos.setter
+    def pos(self, value):
+        self.swarm.pos[self.index] = (value[0], value[1])
 
-    def monsterspeed(self):
-        speed=max(MONSTERSPEED, MONSTERSPEED*(1+(((len(self.path)*32-MONSTER_BUBBLE_DISTANCE)/32)*0.04)))
-        return speed
+    @property
+    def vel(self):
+        return vec(*self.swarm.vel[self.index].tolist())
 
-    def collide_wall(self, dir):
-        """
-        Handles collisions between the Player sprite and Wall Sprite. 
-        Updates the pixel location of the player sprite.
+    @property
+    def pause(self):
+        return int(self.swarm.pause[self.index])
 
-        Args:
-            dir (str): direction of the sprite collisions, either "x" or "y"
-        """
-        if dir == "x":
-            hits = pg.sprite.spritecollide(self, self.game.walls, False, collide_hit_rect)
-            if hits:
-                if self.vel.x > 0: #if moving to the right during collision
-                    self.pos.x = hits[0].rect.left - self.hit_rect.width/2 #put our left hand corner to the left hand corner of the object we hit and shift ourselves outside of tht object
-                if self.vel.x < 0: #if moving to the left during collision
-                    self.pos.x = hits[0].rect.right + self.hit_rect.width/2 # put our left hand corner to the right hand corner
-                self.vel.x = 0 #redundant
-                self.hit_rect.centerx = self.pos.x
+    @pause.setter
+    def pause(self, value):
+        self.swarm.pause[self.index] = value
 
-        if dir == "y": #analgous to x case
-            hits = pg.sprite.spritecollide(self, self.game.walls, False, collide_hit_rect)
-            if hits:
-                if self.vel.y > 0: #if moving down during collision
-                    self.pos.y = hits[0].rect.top - self.hit_rect.height/2 
-                if self.vel.y < 0: #if moving up during collision
-                    self.pos.y = hits[0].rect.bottom + self.hit_rect.height/2
-                self.vel.y = 0 #redundant
-                self.hit_rect.centery = self.pos.y
+    @property
+    def next_step(self):
+        return tuple(self.swarm.next_step[self.index].tolist())
 
+    @next_step.setter
+    def next_step(self, value):
+        self.swarm.next_step[self.index] = value
 
-    def get_closest_free_square(self, sprite):
-        current=(sprite.pos.x/TILESIZE, sprite.pos.y/TILESIZE)
-        
-        reference=(round(current[0]), round(current[1]))
-        d={}
-        for x_prime in range(-3,4):
-            for y_prime in range(-3,4):
-                possible_loc=(reference[0]+x_prime, reference[1]+y_prime)
-                if possible_loc in self.game.graph:
-                    d[possible_loc]=distance(current, possible_loc)
-        
-        if len(d)==0:
-            return reference  
 
-        return min(d, key=d.get)
+    def monsterspeed(self):
+        speed=max(MONSTERSPEED, MONSTERSPEED*(1+(((self.path_length()*32-MONSTER_BUBBLE_DISTANCE)/32)*0.04)))
+        return speed
 
+    def path_length(self):
+        '''
+        Number of nodes left on the monster's path to the player
+        '''
+        field=self.game.flow_field
+        if field is not None:
+            if self.next_step==field.goal:
+                return 1
+            return field.steps_left(self.next_step)+2 #same count as the A* path dict
+        if self.game.hpa is not None:
+            return self.path_estimate #HPA* only refines the start of the path
+        return len(self.path)
+
+    def advance(self, node):
+        '''
+        Returns the node after node on the monster's path to the player
+        '''
+        if self.game.flow_field is not None:
+            return self.game.flow_field.next_step(node)
+        if self.game.hpa is not None and self.path.get(node, node)==node and node!=self.path_goal:
+            if self.game.path_service is None or not self.game.path_service.busy(self):
+                self.generate_path() #reached the end of the refined part, refine the next stretch
+            return self.next_step
+        return self.path.get(node, node) #no path yet while the path service is searching
 
+    def get_closest_free_square(self, sprite):
+        return closest_free_square(self.game.graph, sprite.pos)
 
     def generate_path(self):
         '''
-        A* algorithm that returns a reverse parent dictionary
+        Makes self.path, a dictionary mapping each node on the way to the player to the
+        next one, with the pathing engine of the game: A* by default, HPA* for a partial
+        path, or with a flow field only the next step is read from the field.
         ''' 
 
         start=self.get_closest_free_square(self) #current monster location
+        if self.game.flow_field is not None:
+            self.next_step=self.game.flow_field.next_step(start)
+            return
+
         goal=self.get_closest_free_square(self.game.player) #players location
+        service=self.game.path_service
+        if service is not None:
+            service.submit(self, start, goal, self.path_nodes) #keep following the old path meanwhile
+            return
+        self.set_path(start, goal, self.game.find_path(start, goal, self.path_nodes))
 
-        d = {start:0} #keeps track of shortest distance
-        h = {} #keeps of track heuristic values
-        parent = {} #map from node to parent node; reconstruct with this starting from goal pt
-        visited = {} #make sure we dont revist nodes
-        unvisited = heapdict.heapdict()#queue is ordered by f(n) = g(n) (distance from start node to current node) + h(n) (some heuristic) 
-
-        current = start
-        while current != goal:
-            for neighbor in self.game.graph[current]:
-                #look at unvisited neighbors 
-                if neighbor not in visited:
-                    val = d[current] + distance(current, neighbor) #this is all euclidian distance; distance from start to neighbor
-                    if neighbor not in d:
-                        d[neighbor] = float('inf') #this is much faster than d.get(key, default), inside in case we dont reach certain points
-                    if val<d[neighbor]: #update
-                        #need to update queue too; just add it or replace current value in queue with f(n)
-                        if neighbor not in h:
-                            h[neighbor] = distance(neighbor, goal) #straight line distance
-                            # later use dubin curves and store oritentation as well, this is 
-                        unvisited[neighbor] = val + h[neighbor] #could potentially store heuristic vals separately
-                        d[neighbor] = val 
-                        parent[neighbor] = current #we found a new "shortest distance" with our current node so update parent
-
-            visited[current] = True #update visited; i think this order is right
-            current = unvisited.popitem()[0]
-        
-        #reverse the parent dictionary into self.path
-        pt = goal
-        path = {}
-        while pt != start:
-            child = parent[pt]
-            path[child]=pt
-            pt=child
-
-        self.path=path
-        self.path[goal]=goal #for when the monster reaches the player
-        self.next_step=self.path[start]
+    def set_path(self, start, goal, result):
+        '''
+        Makes self.path from the (nodes, cost, expanded) result of game.find_path for a
+        search from start to goal. A result from the path service may arrive after the
+        monster moved on, so the current next step is kept if it is still on the new path.
+        '''
+        nodes, cost, expanded = result
+        self.game.profiler.count('path searches')
+        self.game.profiler.count('A* expanded', expanded)
+        self.path_nodes=nodes
+        self.path={a:b for a, b in zip(nodes, nodes[1:])}
+        self.path[nodes[-1]]=nodes[-1] #for when the monster reaches the player
+        self.path_goal=goal
+        self.path_estimate=len(nodes) if cost is None or cost==float('inf') else int(cost)+1
+        if self.next_step not in self.path or self.next_step==start:
+            self.next_step=self.path[start]
 
-    def get_keys(self):
-        self.vel = vec(0, 0)
-        self.left=False
-        self.right=False
-        self.up=False
-        self.down=False
-        #current_location = self.get_closest_free_square(self)
-        current_location=self.pos
-        dest=(self.next_step[0]*TILESIZE, self.next_step[1]*TILESIZE)
-
-        self.counter+=1
-        if self.counter%ANIMATION_WALKING_SPEED==0: #every 10 frames
-            self.step+=1
-        if self.step==3:
-            self.step=0
-        
-        #if current_location==self.next_step:
-        if distance(current_location, dest)<5:
-            self.next_step=self.path[self.next_step]
-
-        if current_location[0]-dest[0]<-2:
-            self.right=True
-        if current_location[0]-dest[0]>2:
-            self.left=True
-
-        if current_location[1]-dest[1]<-2:
-            self.down=True
-        if current_location[1]-dest[1]>2:
-            self.up=True
-
-        if self.down:
-            self.image = self.img_map['down'][self.step]
-            self.vel.y = self.monsterspeed()
-        if self.up:
-            self.image = self.img_map['up'][self.step]
-            self.vel.y = -self.monsterspeed()
-        if self.left:
-            self.image = self.img_map['left'][self.step]
-            self.vel.x = -self.monsterspeed()
-        if self.right:
-            self.image = self.img_map['right'][self.step]
-            self.vel.x = self.monsterspeed()
-        
-        if self.vel.x != 0 and self.vel.y != 0:
-            self.vel *= 0.7071
+    def update(self):
+        """
+        Monsters are moved together by game.swarm
+        """
+        pass
+
+class MonsterSwarm:
+    """
+    Moves every Monster of the game in one batched update per frame. Each monster is a
+    row of the NumPy arrays below, so the movement towards the next path node is computed
+    for all of them at once; only path lookups and wall collisions are done per monster.
+
+    Attributes:
+        game (Game): the game the swarm is part of
+        monsters (list): the Monster sprites, in row order
+        pos (ndarray): float array of shape (N, 2) with the pixel position of each monster
+        vel (ndarray): float array of shape (N, 2) with the velocity of each monster
+        next_step (ndarray): int array of shape (N, 2) with the next path node of each monster
+        pause (ndarray): frames each monster stays paused for (e.g. after a hit)
+        counter (ndarray): frames each monster has been walking for
+        step (ndarray): walking animation frame of each monster
+    """
+    def __init__(self, game):
+        self.game=game
+        self.monsters=[]
+        self.pos=np.zeros((0, 2))
+        self.vel=np.zeros((0, 2))
+        self.next_step=np.zeros((0, 2), dtype=int)
+        self.pause=np.zeros(0, dtype=int)
+        self.counter=np.zeros(0, dtype=int)
+        self.step=np.zeros(0, dtype=int)
+
+    def add(self, monster, x, y):
+        """
+        Adds a row for a new monster at pixel (x, y).
+
+        Returns:
+            The row index of the monster
+        """
+        self.monsters.append(monster)
+        self.pos=np.vstack([self.pos, (x, y)])
+        self.vel=np.vstack([self.vel, (0, 0)])
+        self.next_step=np.vstack([self.next_step, (round(x/TILESIZE), round(y/TILESIZE))])
+        self.pause=np.append(self.pause, 0)
+        self.counter=np.append(self.counter, 0)
+        self.step=np.append(self.step, 1)
+        return len(self.monsters)-1
+
+    def nearest_distance(self, pos):
+        """
+        Returns the pixel distance from pos to the closest monster.
+        """
+        if len(self.monsters)==0:
+            return float('inf')
+        return np.hypot(*(self.pos-(pos[0], pos[1])).T).min()
+
+    def tiles(self):
+        """
+        Returns an (N, 2) array with the rounded tile of each monster.
+        """
+        return np.round(self.pos/TILESIZE)
 
     def update(self):
         """
-        Updates the x and y pixel coordinates of the player
-        based on the velocities.
+        Moves every monster that is not paused one frame towards its next path node.
         """
-        if self.pause>0:
-            self.pause-=1
+        if len(self.monsters)==0:
+            return
+        if self.game.path_service is not None:
+            for monster, start, goal, result in self.game.path_service.poll():
+                if monster.alive():
+                    monster.set_path(start, goal, result)
+
+        paused=self.pause>0
+        self.pause[paused]-=1
+        active=np.flatnonzero(~paused)
+        if len(active)==0:
             return
 
         #make path every 100 frames or something
-        if self.counter%100==0:
-            self.generate_path()
-        
-        self.get_keys()
-        self.pos += self.vel * self.game.dt
-        self.rect=self.image.get_rect()
-        self.rect.center = self.pos
-        self.hit_rect.centerx = self.pos.x
-        self.collide_wall('x')
-        self.hit_rect.centery = self.pos.y
-        self.collide_wall('y') 
-        self.rect.center = self.hit_rect.center
+        with self.game.profiler.section('pathfinding'):
+            for i in active[self.counter[active]%100==0]:
+                self.monsters[i].generate_path()
+
+        #animation
+        self.counter[active]+=1
+        self.step[active]+=self.counter[active]%ANIMATION_WALKING_SPEED==0
+        self.step[self.step==3]=0
+
+        #head for the next node; move the target along the path once it is reached
+        dest=self.next_step[active]*TILESIZE
+        delta=self.pos[active]-dest
+        for i in active[np.hypot(*delta.T)<5]:
+            monster=self.monsters[i]
+            self.next_step[i]=monster.advance(monster.next_step)
+        lengths=np.array([self.monsters[i].path_length() for i in active])
+        speed=np.maximum(MONSTERSPEED, MONSTERSPEED*(1+(((lengths*32-MONSTER_BUBBLE_DISTANCE)/32)*0.04)))
+
+        right, left = delta[:, 0]<-2, delta[:, 0]>2
+        down, up = delta[:, 1]<-2, delta[:, 1]>2
+        vel=np.zeros((len(active), 2))
+        vel[:, 1]=np.where(up, -speed, np.where(down, speed, 0))
+        vel[:, 0]=np.where(right, speed, np.where(left, -speed, 0))
+        vel[(vel[:, 0]!=0) & (vel[:, 1]!=0)]*=0.7071
+        self.vel[active]=vel
+        self.pos[active]+=vel*self.game.dt
+
+        #last pressed direction wins, like the player's keys
+        facing=np.select([right, left, up, down], ['right', 'left', 'up', 'down'], '')
+        with self.game.profiler.section('collision'):
+            for row, i in enumerate(active):
+                monster=self.monsters[i]
+                if facing[row]:
+                    monster.image=monster.img_map[facing[row]][self.step[i]]
+                monster.rect=monster.image.get_rect()
+                monster.rect.center=tuple(self.pos[i])
+                monster.hit_rect.centerx=self.pos[i, 0]
+                self.collide_wall(i, 0)
+                monster.hit_rect.centery=self.pos[i, 1]
+                self.collide_wall(i, 1)
+                monster.rect.center=monster.hit_rect.center
+
+    def collide_wall(self, i, axis):
+        """
+        Handles collisions between monster i and the walls along one axis (0 for x,
+        1 for y), pushing the monster back out of the wall it moved into.
+        """
+        monster=self.monsters[i]
+        hits=self.game.wall_index.collide(monster.hit_rect)
+        if not hits:
+            return
+        if axis==0:
+            if self.vel[i, 0]>0: #if moving to the right during collision
+                self.pos[i, 0]=hits[0].rect.left-monster.hit_rect.width/2
+            if self.vel[i, 0]<0: #if moving to the left during collision
+                self.pos[i, 0]=hits[0].rect.right+monster.hit_rect.width/2
+            monster.hit_rect.centerx=self.pos[i, 0]
+        else:
+            if self.vel[i, 1]>0: #if moving down during collision
+                self.pos[i, 1]=hits[0].rect.top-monster.hit_rect.height/2
+            if self.vel[i, 1]<0: #if moving up during collision
+                self.pos[i, 1]=hits[0].rect.bottom+monster.hit_rect.height/2
+            monster.hit_rect.centery=self.pos[i, 1]
+        self.vel[i, axis]=0
 
 class Obstacle(pg.sprite.Sprite):
     def __init__(self, game, x, y, w, h):
@@ -447,28 +530,35 @@ class Mirror(pg.sprite.Sprite):
 class Flashlight(pg.sprite.Sprite):
     def __init__(self, game, x, y):
         self._layer=FLASHLIGHT_LAYER
-        self.groups = game.static_sprites
+        self.groups = () #drawn and updated through Lighting
         pg.sprite.Sprite.__init__(self, self.groups)
-        self.images=[]
-        filename = 'glow_v0.png'
-        for i in range(10):
-            img = pg.image.load(path.join(game.animation_folder, filename)).convert_alpha()
-            if i<5:    
-                img = pg.transform.scale(img, (400-10*i, 400))
-            if i>=5:
-                img = self.images[9-i]
-            self.images.append(img)
-
+        self.images=self.load_images(game)
+        self.game=game
         self.image=self.images[0]
         self.rect = self.image.get_rect()
         self.rect.center=(x,y)
         self.frame=0
         self.frame_rate=10
-        self.last_update=pg.time.get_ticks()
+        self.last_update=game.sim_time
         self.on=True
+
+    @staticmethod
+    def load_images(game):
+        '''
+        Returns the glow animation frames: the glow narrows over 5 frames and widens back.
+        '''
+        images=[]
+        filename = 'glow_v0.png'
+        for i in range(10):
+            if i<5:    
+                img = assets.image(path.join(game.animation_folder, filename), (400-10*i, 400))
+            if i>=5:
+                img = images[9-i]
+            images.append(img)
+        return images
     
     def update(self):
-        now = pg.time.get_ticks()
+        now = self.game.sim_time
         if now - self.last_update>self.frame_rate:
             self.last_update=now
             self.frame+=1
@@ -482,43 +572,126 @@ class Flashlight(pg.sprite.Sprite):
 class Darkness(pg.sprite.Sprite):
     def __init__(self, game, x, y):
         self._layer=DARKNESS_LAYER
-        self.groups = game.static_sprites
+        self.groups = () #drawn and updated through Lighting
         pg.sprite.Sprite.__init__(self, self.groups)
-        self.visible= pg.image.load(path.join(game.animation_folder, "visible.png")).convert_alpha()
-        self.blackout= pg.image.load(path.join(game.animation_folder, "darkness.png")).convert_alpha()
+        self.visible, self.blackout = self.load_images(game)
         self.image = self.visible
         self.rect = self.image.get_rect()
         self.rect.center=(x,y)
         self.on=False
 
+    @staticmethod
+    def load_images(game):
+        '''
+        Returns the (visible, blackout) images, with the flashlight on and off.
+        '''
+        return (assets.image(path.join(game.animation_folder, "visible.png")),
+                assets.image(path.join(game.animation_folder, "darkness.png")))
+
     def update(self):
         if self.on:
             self.image=self.blackout
         else:
             self.image=self.visible
 
+class Lighting(pg.sprite.Sprite):
+    """
+    Draws the flashlight glow and the darkness as a single screen-sized overlay. Each
+    (glow frame, darkness image) pair is composited once into a cached mask, so a frame
+    costs one alpha blit instead of blitting the glow and then the darkness.
+
+    Attributes:
+        flashlight (Flashlight): gives the current glow frame and its rect
+        darkness (Darkness): gives the current darkness image
+        masks (dict): class-wide cache mapping (glow, darkness, glow center) to a mask
+        dirty_area (Rect): the part of the screen that can change while the darkness
+            image stays the same (the glow), or None after the darkness switched
+    """
+    masks={}
+
+    def __init__(self, game, flashlight, darkness):
+        self._layer=DARKNESS_LAYER
+        self.groups = game.static_sprites
+        pg.sprite.Sprite.__init__(self, self.groups)
+        self.flashlight=flashlight
+        self.darkness=darkness
+        self.rect=darkness.rect.copy()
+        self.glow_area=flashlight.rect.unionall([flashlight.rect.copy().inflate(img.get_width()-flashlight.rect.width, 0) for img in flashlight.images])
+        self.dirty_area=None
+        self.update()
+
+    def update(self):
+        last_darkness=self.darkness.image
+        self.flashlight.update()
+        self.darkness.update()
+        self.image=Lighting.masks[(self.flashlight.image, self.darkness.image, self.flashlight.rect.center)]
+        self.dirty_area=self.glow_area if self.darkness.image is last_darkness else None
+
+    @staticmethod
+    def prebake(game, center):
+        '''
+        Bakes the mask of every glow frame over both darkness images, with the lighting
+        centered on center. Run while loading: baking one mask takes about a tenth of a
+        second, so update only looks the masks up.
+        '''
+        darkness_images=Darkness.load_images(game)
+        rect=darkness_images[0].get_rect(center=center) #the Darkness sprite's rect
+        for glow in set(Flashlight.load_images(game)):
+            for darkness in darkness_images:
+                key=(glow, darkness, center)
+                if key not in Lighting.masks:
+                    Lighting.masks[key]=Lighting.bake(rect, [(glow, glow.get_rect(center=center)), (darkness, rect)])
+
+    @staticmethod
+    def bake(rect, layers):
+        '''
+        Composites the (image, screen rect) layers in order ("over", straight alpha) into
+        a new mask covering rect.
+        '''
+        size=rect.size
+        rgb=np.zeros((size[0], size[1], 3), dtype=np.float32)
+        alpha=np.zeros(size, dtype=np.float32)
+        for image, layer_rect in layers:
+            layer_rect=layer_rect.move(-rect.x, -rect.y)
+            area=layer_rect.clip(pg.Rect((0, 0), size))
+            if area.width==0 or area.height==0:
+                continue
+            src=area.move(-layer_rect.x, -layer_rect.y)
+            src_rgb=pg.surfarray.array3d(image)[src.left:src.right, src.top:src.bottom]/np.float32(255)
+            src_a=pg.surfarray.array_alpha(image)[src.left:src.right, src.top:src.bottom, None]/np.float32(255)
+            dst_rgb=rgb[area.left:area.right, area.top:area.bottom]
+            dst_a=alpha[area.left:area.right, area.top:area.bottom, None]
+            out_a=src_a+dst_a*(1-src_a)
+            dst_rgb[:]=np.divide(src_rgb*src_a+dst_rgb*dst_a*(1-src_a), out_a, out=np.zeros_like(dst_rgb), where=out_a>0)
+            dst_a[:]=out_a
+        mask=pg.Surface(size, pg.SRCALPHA).convert_alpha()
+        pg.surfarray.pixels3d(mask)[:]=np.round(rgb*255).astype(np.uint8)
+        pg.surfarray.pixels_alpha(mask)[:]=np.round(alpha*255).astype(np.uint8)
+        return mask
+
 class Heart(pg.sprite.Sprite):
     def __init__(self, game, x, y):
         self._layer=HEART_LAYER
         self.groups = game.hearts, game.static_sprites
         pg.sprite.Sprite.__init__(self, self.groups)
-        self.image = pg.image.load(path.join(game.sprite_folder, HEART_FILE)).convert_alpha()
+        self.image = assets.image(path.join(game.sprite_folder, HEART_FILE))
         self.dissolve_images=[]
         for i in range(9):
             filename = 'dissolve_{}.png'.format(i)
-            img = pg.image.load(path.join(game.animation_folder, filename)).convert_alpha()
+            img = assets.image(path.join(game.animation_folder, filename))
             self.dissolve_images.append(img)
 
         self.rect = self.image.get_rect()
         self.rect.center=(x,y)
+        self.game=game
         self.dissolve=False
         self.frame=-1
         self.frame_rate=90
-        self.last_update=pg.time.get_ticks()
+        self.last_update=game.sim_time
 
     def update(self):
         if self.dissolve:
-            now = pg.time.get_ticks()
+            now = self.game.sim_time
             if now - self.last_update>self.frame_rate:
                 self.last_update=now
                 self.frame+=1
@@ -531,17 +704,102 @@ class Heart(pg.sprite.Sprite):
                 self.rect.center = center
 
 class Minimap(pg.sprite.Sprite):
-    def __init__(self, game, filename):
+    """
+    The maze seen from above, drawn from the occupancy grid: walls and paths are colored
+    with NumPy and scaled once. With fog, the tiles start hidden and the ones around the
+    player are revealed by copying just their part of the map into the image, which only
+    happens when the player reaches a tile whose surroundings were not all seen yet.
+
+    Attributes:
+        map (Surface): the whole maze at minimap size
+        buffers (list): two copies of the revealed minimap; every reveal goes into both
+            and self.image becomes the one not drawn last, so the change gets drawn
+        seen (ndarray): bool array of shape (tile_height, tile_width), the revealed tiles
+        scale (tuple): minimap pixels per map pixel along x and y
+        tile (tuple): the (column, row) of the player at the last update
+        dirty_area (Rect): the screen area of the reveals since the last draw, all that
+            has to be redrawn
+    """
+    def __init__(self, game):
         self._layer=MINIMAP_LAYER
         self.groups = game.static_sprites
         pg.sprite.Sprite.__init__(self, self.groups)
-        self.image = pg.image.load(path.join(game.map_folder, filename)).convert_alpha()
-        self.image = pg.transform.scale(self.image, (WIDTH//3, HEIGHT//3))
+        self.game=game
+        grid=game.grid.grid
+        colors=np.where((grid.T==1)[..., None], MINIMAP_WALL_COLOR, MINIMAP_PATH_COLOR).astype(np.uint8)
+        self.map=pg.transform.scale(pg.surfarray.make_surface(colors), MINIMAP_SIZE).convert()
+        self.scale=(MINIMAP_SIZE[0]/game.grid.width, MINIMAP_SIZE[1]/game.grid.height)
+        self.seen=np.full(grid.shape, not MINIMAP_FOG)
+        self.buffers=[]
+        for i in range(2):
+            if MINIMAP_FOG:
+                buffer=pg.Surface(MINIMAP_SIZE).convert()
+                buffer.fill(MINIMAP_FOG_COLOR)
+            else:
+                buffer=self.map
+            self.buffers.append(buffer)
+        self.image=self.buffers[0]
         self.rect = self.image.get_rect()
-        self.rect = MINIMAP_LOCATION
+        self.rect.topleft = MINIMAP_LOCATION
+        self.tile=None
+        self.dirty_area=None
+
+    def to_minimap(self, pos):
+        """
+        Returns the screen position of a map pixel position on the minimap.
+        """
+        return (self.rect.x + int(pos[0]*self.scale[0]), self.rect.y + int(pos[1]*self.scale[1]))
 
     def update(self):
-        pass
+        if not MINIMAP_FOG:
+            return
+        c, r = int(self.game.player.pos.x//TILESIZE), int(self.game.player.pos.y//TILESIZE)
+        if (c, r) == self.tile:
+            return
+        self.tile=(c, r)
+        radius=MINIMAP_REVEAL_RADIUS
+        c0, r0 = max(c-radius, 0), max(r-radius, 0)
+        c1, r1 = min(c+radius+1, self.seen.shape[1]), min(r+radius+1, self.seen.shape[0])
+        if c0>=c1 or r0>=r1 or self.seen[r0:r1, c0:c1].all():
+            return
+        self.seen[r0:r1, c0:c1]=True
+        x0, y0 = int(c0*TILESIZE*self.scale[0]), int(r0*TILESIZE*self.scale[1])
+        x1, y1 = math.ceil(c1*TILESIZE*self.scale[0]), math.ceil(r1*TILESIZE*self.scale[1])
+        area=pg.Rect(x0, y0, x1-x0, y1-y0)
+        for buffer in self.buffers:
+            buffer.blit(self.map, area, area)
+        area.move_ip(self.rect.topleft)
+        drawn=self.game.last_drawn.get(self)
+        last_image=drawn[0] if drawn is not None else None
+        if self.dirty_area is None or self.image is last_image:
+            self.dirty_area=area
+        else: #several reveals before the next draw
+            self.dirty_area=self.dirty_area.union(area)
+        self.image=self.buffers[0] if last_image is self.buffers[1] else self.buffers[1]
+
+class MinimapMarker(pg.sprite.Sprite):
+    """
+    A small square following a sprite on the minimap. It is a sprite of its own, so when it
+    moves only its old and new spots are redrawn. Markers share the minimap's layer and are
+    created after it, so they are drawn on top.
+
+    Attributes:
+        minimap (Minimap): the minimap the marker is drawn on
+        target (Sprite): the followed sprite; its hit_rect center is used
+    """
+    def __init__(self, game, minimap, target, color):
+        self._layer=MINIMAP_LAYER
+        self.groups = game.static_sprites
+        pg.sprite.Sprite.__init__(self, self.groups)
+        self.minimap=minimap
+        self.target=target
+        self.image=pg.Surface((MINIMAP_MARKER_SIZE, MINIMAP_MARKER_SIZE)).convert()
+        self.image.fill(color)
+        self.rect=self.image.get_rect()
+        self.update()
+
+    def update(self):
+        self.rect.center=self.minimap.to_minimap(self.target.hit_rect.center)
 
 class Battery(pg.sprite.Sprite):
     def __init__(self, game, x, y):
@@ -552,7 +810,7 @@ class Battery(pg.sprite.Sprite):
         self.images = [] 
         for i in range(4):
             filename = 'battery_{}.png'.format(i)
-            img = pg.image.load(path.join(game.animation_folder, filename)).convert_alpha()
+            img = assets.image(path.join(game.animation_folder, filename))
             self.images.append(img)
 
         self.image=self.images[-1]
@@ -561,11 +819,11 @@ class Battery(pg.sprite.Sprite):
         self.dissolve=False
         self.bars=3
         self.duration=BATTERY_DURATION
-        self.last_update=pg.time.get_ticks()
+        self.last_update=game.sim_time
 
     def update(self):
         if self.game.flashlight.on:        
-            now = pg.time.get_ticks()
+            now = self.game.sim_time
             if now - self.last_update>self.duration:
                 self.last_update=now
                 self.bars-=1
@@ -577,4 +835,98 @@ class Battery(pg.sprite.Sprite):
                 if self.bars==0:
                     self.game.transition=True
                     self.game.darkness.on=True
-                    self.game.darkness.image=self.game.darkness.blackout
\ No newline at end of file
+                    self.game.darkness.image=self.game.darkness.blackout
+
+class ProfileOverlay(pg.sprite.Sprite):
+    """
+    Shows the profiler's frame rate, phase times and counters of the last frames in the
+    bottom left corner of the screen, re-rendered every PROFILE_OVERLAY_PERIOD ticks.
+
+    Attributes:
+        game (Game): the game whose profiler is shown
+        font (Font): font of the overlay text
+        ticks (int): simulation ticks since the overlay was created
+    """
+    def __init__(self, game):
+        self._layer=PROFILE_LAYER
+        self.groups = game.static_sprites
+        pg.sprite.Sprite.__init__(self, self.groups)
+        self.game=game
+        self.font=pg.font.Font(None, 20)
+        self.ticks=0
+        self.render()
+
+    def render(self):
+        lines=[self.font.render(line, True, WHITE) for line in self.game.profiler.summary_lines()]
+        width=max(line.get_width() for line in lines)+8
+        height=sum(line.get_height() for line in lines)+8
+        self.image=pg.Surface((width, height), pg.SRCALPHA)
+        self.image.fill((0, 0, 0, 160))
+        y=4
+        for line in lines:
+            self.image.blit(line, (4, y))
+            y+=line.get_height()
+        self.rect=self.image.get_rect()
+        self.rect.bottomleft=(10, HEIGHT-10)
+
+    def update(self):
+        self.ticks+=1
+        if self.ticks%PROFILE_OVERLAY_PERIOD==0:
+            self.render()
+
+class Caption(pg.sprite.Sprite):
+    """
+    Cutscene text drawn over the game, made of pieces (letters or whole lines) added one
+    at a time by the timeline.
+
+    Attributes:
+        pieces (list): the (Surface, screen Rect) of every piece added so far
+        cursor (tuple): where the next typewriter text continues by default
+    """
+    def __init__(self, game):
+        self._layer=CAPTION_LAYER
+        self.groups = game.static_sprites
+        pg.sprite.Sprite.__init__(self, self.groups)
+        self.pieces=[]
+        self.cursor=(0, 0)
+        self.image=pg.Surface((0, 0), pg.SRCALPHA)
+        self.rect=self.image.get_rect()
+
+    def write(self, surface, center):
+        '''
+        Adds a rendered piece of text centered on center; returns its screen Rect.
+        '''
+        rect=surface.get_rect()
+        rect.center=center
+        self.pieces.append((surface, rect))
+        self.rect=rect.unionall([r for _, r in self.pieces])
+        self.image=pg.Surface(self.rect.size, pg.SRCALPHA)
+        for piece, r in self.pieces:
+            self.image.blit(piece, r.move(-self.rect.x, -self.rect.y))
+        return rect
+
+class Fade(pg.sprite.Sprite):
+    """
+    A color laid over the whole screen with a changing opacity.
+
+    Attributes:
+        color (tuple): the color faded in
+        level (int): the current alpha, 0 to 255
+    """
+    def __init__(self, game, color):
+        self._layer=FADE_LAYER
+        self.groups = game.static_sprites
+        pg.sprite.Sprite.__init__(self, self.groups)
+        self.color=color
+        self.level=None
+        self.set_level(0)
+        self.rect=self.image.get_rect()
+
+    def set_level(self, alpha):
+        alpha=int(alpha)
+        if alpha==self.level:
+            return #same image, so nothing to redraw
+        self.level=alpha
+        self.image=pg.Surface((WIDTH, HEIGHT))
+        self.image.fill(self.color)
+        self.image.set_alpha(alpha)
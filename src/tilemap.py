@@ -1,4 +1,7 @@
 ''''''
+from collections import OrderedDict
+from random import randint
+import numpy as np
 import pygame as pg
 import pytmx
 from settings import *
@@ -31,6 +34,223 @@ class TiledMap:
         self.render(tmp_surface)
         return tmp_surface
 
+    def render_area(self, surface, tile_x, tile_y, tile_w, tile_h):
+        """
+        Renders only the tiles inside a tile-aligned window onto a surface, with the
+        window's top left tile drawn at (0, 0).
+
+        Args:
+            surface (Surface): the surface to draw the tiles on
+            tile_x (int): the left most tile column of the window
+            tile_y (int): the top most tile row of the window
+            tile_w (int): width of the window in tiles
+            tile_h (int): height of the window in tiles
+        """
+        ti = self.tmxdata.get_tile_image_by_gid
+        tw, th = self.tmxdata.tilewidth, self.tmxdata.tileheight
+        x_end = min(tile_x + tile_w, self.tmxdata.width)
+        y_end = min(tile_y + tile_h, self.tmxdata.height)
+        for layer in self.tmxdata.visible_layers:
+            if isinstance(layer, pytmx.TiledTileLayer):
+                for y in range(tile_y, y_end):
+                    row = layer.data[y]
+                    for x in range(tile_x, x_end):
+                        tile = ti(row[x])
+                        if tile:
+                            surface.blit(tile, ((x - tile_x) * tw, (y - tile_y) * th))
+
+class ChunkedMap:
+    """
+    Renders a TiledMap as fixed-size chunks that are baked on demand, so only the
+    part of the map around the camera ever lives in memory.
+
+    Attributes:
+        map (TiledMap): the map the chunks are baked from
+        chunk_size (int): width/height of a chunk in tiles
+        chunk_width (int): pixel width of a full chunk
+        chunk_height (int): pixel height of a full chunk
+        cache_bytes (int): memory cap for baked chunks; least recently used chunks
+            are dropped once it is exceeded
+        chunks (OrderedDict): LRU cache mapping (chunk column, chunk row) to a Surface
+    """
+    def __init__(self, tiled_map, chunk_size=CHUNK_SIZE, cache_bytes=CHUNK_CACHE_BYTES):
+        self.map = tiled_map
+        self.chunk_size = chunk_size
+        self.chunk_width = chunk_size * tiled_map.tmxdata.tilewidth
+        self.chunk_height = chunk_size * tiled_map.tmxdata.tileheight
+        self.cache_bytes = cache_bytes
+        self.chunks = OrderedDict()
+        self.used_bytes = 0
+
+    def bake(self, cx, cy):
+        """
+        Renders a single chunk into a new surface.
+
+        Args:
+            cx (int): chunk column
+            cy (int): chunk row
+
+        Returns:
+            A Surface holding the tiles of the chunk
+        """
+        w = min(self.chunk_width, self.map.width - cx * self.chunk_width)
+        h = min(self.chunk_height, self.map.height - cy * self.chunk_height)
+        surface = pg.Surface((w, h))
+        self.map.render_area(surface, cx * self.chunk_size, cy * self.chunk_size, self.chunk_size, self.chunk_size)
+        return surface.convert()
+
+    def get_chunk(self, cx, cy):
+        """
+        Returns the baked chunk at (cx, cy), baking it (and evicting the least recently
+        used chunks past the memory cap) if it is not cached.
+        """
+        key = (cx, cy)
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            self.chunks.move_to_end(key)
+            return chunk
+        chunk = self.bake(cx, cy)
+        self.chunks[key] = chunk
+        self.used_bytes += chunk.get_pitch() * chunk.get_height()
+        #always keep at least the chunk we just baked
+        while self.used_bytes > self.cache_bytes and len(self.chunks) > 1:
+            _, old = self.chunks.popitem(last=False)
+            self.used_bytes -= old.get_pitch() * old.get_height()
+        return chunk
+
+    def draw(self, surface, camera):
+        """
+        Blits only the chunks that intersect the camera view onto a surface.
+
+        Args:
+            surface (Surface): the surface to draw on (usually the screen)
+            camera (Camera): the camera giving the current view
+
+        Returns:
+            The number of chunks blitted
+        """
+        view = camera.view_rect().clip(pg.Rect(0, 0, self.map.width, self.map.height))
+        if view.width == 0 or view.height == 0:
+            return 0
+        ox, oy = camera.camera.topleft
+        blits = 0
+        for cy in range(view.top // self.chunk_height, (view.bottom - 1) // self.chunk_height + 1):
+            for cx in range(view.left // self.chunk_width, (view.right - 1) // self.chunk_width + 1):
+                surface.blit(self.get_chunk(cx, cy), (cx * self.chunk_width + ox, cy * self.chunk_height + oy))
+                blits += 1
+        return blits
+
+    def clear(self):
+        """
+        Drops every baked chunk.
+        """
+        self.chunks.clear()
+        self.used_bytes = 0
+
+class SpatialHash:
+    """
+    A static uniform grid over the rects of a group of sprites (walls, mirrors, goals),
+    so collision checks only look at the sprites in the cells a rect touches instead
+    of every sprite in the group.
+
+    Attributes:
+        cell_size (int): pixel width/height of a grid cell
+        sprites (list): the indexed sprites, in group order
+        cells (dict): maps (cell column, cell row) to the list of sprite positions in
+            self.sprites overlapping that cell
+    """
+    def __init__(self, sprites, cell_size=SPATIAL_CELL_SIZE):
+        self.cell_size = cell_size
+        self.sprites = list(sprites)
+        self.cells = {}
+        for i, sprite in enumerate(self.sprites):
+            for cell in self.cells_of(sprite.rect):
+                self.cells.setdefault(cell, []).append(i)
+
+    def cells_of(self, rect):
+        """
+        Returns the (column, row) of every cell a rect overlaps.
+        """
+        size = self.cell_size
+        return [(cx, cy) for cy in range(rect.top // size, (rect.bottom - 1) // size + 1)
+                         for cx in range(rect.left // size, (rect.right - 1) // size + 1)]
+
+    def query(self, rect):
+        """
+        Returns the sprites sharing a cell with rect (a superset of the ones touching it),
+        in group order.
+        """
+        found = set()
+        for cell in self.cells_of(rect):
+            found.update(self.cells.get(cell, ()))
+        return [self.sprites[i] for i in sorted(found)]
+
+    def collide(self, rect):
+        """
+        Returns the sprites whose rect collides with rect, in group order; the same
+        result spritecollide gives against the whole group.
+        """
+        return [sprite for sprite in self.query(rect) if rect.colliderect(sprite.rect)]
+
+class TeleportTable:
+    """
+    A per tile lookup of the mirrors, so a portal check is an array lookup on the tiles
+    under a sprite, plus the cumulative distributions a monster picks its exit mirror
+    with (0.9 for the mirror it touched, the rest shared by the other mirrors).
+
+    Attributes:
+        mirrors (list): the Mirror sprites, in group order
+        tiles (array): (rows, columns) int array with the position in self.mirrors of
+            the mirror overlapping each tile, -1 elsewhere
+        rows (list): self.tiles as nested lists, for the per sprite lookups
+        destinations (array): (mirrors, 2) array of each mirror's destination tile
+        cdf (array): (mirrors, mirrors) array, row i is the cumulative distribution of
+            the exit mirror for a monster touching mirror i
+    """
+    def __init__(self, mirrors, width, height):
+        self.mirrors = list(mirrors)
+        self.tiles = np.full((height // TILESIZE + 1, width // TILESIZE + 1), -1, dtype=np.int32)
+        for i, mirror in enumerate(self.mirrors):
+            x0, y0, x1, y1 = self.tiles_of(mirror.rect)
+            self.tiles[y0:y1, x0:x1] = i #mirrors never share a tile
+        self.rows = self.tiles.tolist()
+        self.destinations = np.array([(m.tp_x, m.tp_y) for m in self.mirrors], dtype=np.int32).reshape(-1, 2)
+
+        n = len(self.mirrors)
+        same = (self.destinations[:, None] == self.destinations[None, :]).all(axis=2)
+        prob = np.where(same, 0.9, 0.1 / max(n - 1, 1))
+        self.cdf = prob.cumsum(axis=1)
+        if n:
+            self.cdf /= self.cdf[:, -1:] #same normalisation as np.random.choice
+
+    def tiles_of(self, rect):
+        """
+        Returns the (x0, y0, x1, y1) tile window a rect overlaps, clipped to the table.
+        """
+        rows, cols = self.tiles.shape
+        return (max(rect.left // TILESIZE, 0), max(rect.top // TILESIZE, 0),
+                min((rect.right - 1) // TILESIZE + 1, cols), min((rect.bottom - 1) // TILESIZE + 1, rows))
+
+    def hit(self, rect):
+        """
+        Returns the position of the first mirror colliding with rect in group order (the
+        one spritecollide found first), or -1.
+        """
+        x0, y0, x1, y1 = self.tiles_of(rect)
+        first = -1
+        for row in self.rows[y0:y1]: #a sprite covers at most a few tiles, plain lists beat numpy here
+            for i in row[x0:x1]:
+                if i >= 0 and (first < 0 or i < first) and rect.colliderect(self.mirrors[i].rect):
+                    first = i
+        return first
+
+    def choose(self, i, sample):
+        """
+        Returns the mirror a monster touching mirror i leaves through, for a uniform
+        sample in [0, 1).
+        """
+        return int(self.cdf[i].searchsorted(sample, side='right'))
+
 class Camera:
     """
     Represents a camera, which is the view the player sprite has of the map on the screen. 
@@ -46,6 +266,8 @@ class Camera:
         self.camera = pg.Rect(0, 0, width, height)
         self.width = width #map width
         self.height = height #map height
+        self.previous = self.camera #position at the previous simulation tick
+        self.target = self.camera #position at the latest simulation tick
     
 
     def update(self, target):
@@ -57,8 +279,22 @@ class Camera:
         x = -target.rect.centerx + int(WIDTH / 2)
         y = -target.rect.centery + int(HEIGHT / 2)
 
-        self.camera = pg.Rect(x, y, self.width, self.height)
+        self.previous = self.target
+        self.target = pg.Rect(x, y, self.width, self.height)
+        if abs(self.target.x - self.previous.x) + abs(self.target.y - self.previous.y) > CAMERA_SNAP_DISTANCE:
+            self.previous = self.target #teleported, dont slide across the map
+        self.camera = self.target
+
+    def interpolate(self, alpha):
+        """
+        Places the camera between its last two simulation positions for drawing.
 
+        Args:
+            alpha (float): 0 for the previous tick's position, 1 for the latest one
+        """
+        x = self.previous.x + (self.target.x - self.previous.x) * alpha
+        y = self.previous.y + (self.target.y - self.previous.y) * alpha
+        self.camera = pg.Rect(round(x), round(y), self.width, self.height)
 
     def apply(self, entity):
         """
@@ -76,59 +312,297 @@ class Camera:
     def apply_rect(self, rect): #made for map bc it is not a sprite
         return rect.move(self.camera.topleft)
 
+    def view_rect(self):
+        """
+        Returns the part of the map (in map pixel coordinates) currently on the screen.
+        """
+        return pg.Rect(-self.camera.x, -self.camera.y, WIDTH, HEIGHT)
+
+
+class Graph:
+    """
+    The maze graph stored as a compressed sparse row (CSR) adjacency. Nodes are numbered
+    in row-major tile order and the neighbors of node i are indices[offsets[i]:offsets[i+1]].
+    It still behaves like the old dict of sets keyed by (column, row) tuples for `in`,
+    iteration and graph[node], which returns the neighbors as a tuple of tuples.
+
+    Attributes:
+        nodes (ndarray): int32 array of shape (N, 2) with the (column, row) tile of each node
+        index (ndarray): int32 array of shape (tile_height, tile_width) mapping a tile to
+            its node id, or -1 if the tile is not a node
+        offsets (ndarray): int32 array of shape (N+1,) with the start of each node's neighbors
+        indices (ndarray): int32 array with the neighbor node ids
+    """
+    def __init__(self, nodes, index, offsets, indices):
+        self.nodes = nodes
+        self.index = index
+        self.offsets = offsets
+        self.indices = indices
+        self.tile_height, self.tile_width = index.shape
+
+    def node_id(self, node):
+        """
+        Returns the id of a (column, row) node, or -1 if it is not in the graph.
+        """
+        c, r = node
+        if 0 <= c < self.tile_width and 0 <= r < self.tile_height and c == int(c) and r == int(r):
+            return int(self.index[int(r), int(c)])
+        return -1
+
+    def neighbor_ids(self, i):
+        """
+        Returns the ids of the neighbors of node id i.
+        """
+        return self.indices[self.offsets[i]:self.offsets[i+1]]
+
+    def __contains__(self, node):
+        return self.node_id(node) >= 0
+
+    def __getitem__(self, node):
+        i = self.node_id(node)
+        if i < 0:
+            raise KeyError(node)
+        return tuple(map(tuple, self.nodes[self.neighbor_ids(i)].tolist()))
+
+    def __iter__(self):
+        return map(tuple, self.nodes.tolist())
+
+    def __len__(self):
+        return len(self.nodes)
+
+def grow_rect(cells, y, x):
+    """
+    Grows the rect of True cells through (x, y): first along the row, then up and down
+    as far as the whole span stays True. Returns (x0, y0, x1, y1), ends exclusive.
+    """
+    height, width = cells.shape
+    x0, x1 = x, x+1
+    while x0>0 and cells[y, x0-1]:
+        x0-=1
+    while x1<width and cells[y, x1]:
+        x1+=1
+    y0, y1 = y, y+1
+    while y0>0 and cells[y0-1, x0:x1].all():
+        y0-=1
+    while y1<height and cells[y1, x0:x1].all():
+        y1+=1
+    return x0, y0, x1, y1
+
+def merge_walls(walls):
+    """
+    Returns a small set of (x, y, width, height) tile rects, made of wall tiles only,
+    covering every wall tile of a boolean grid that is next to a free tile (walls deep
+    inside solid areas can never be touched, so rects may cover them or not). Each
+    uncovered wall is grown into a rect row first and column first and the one covering
+    more uncovered walls is kept; rects made redundant by later ones are dropped at the
+    end. The game's colliders and the maptools walls command both come from here.
+    """
+    free=np.pad(~walls, 1)
+    near_free=np.zeros_like(walls)
+    for dy in range(3):
+        for dx in range(3):
+            near_free|=free[dy:dy+walls.shape[0], dx:dx+walls.shape[1]]
+    needed=walls & near_free
+
+    covered=np.zeros_like(walls)
+    rects=[]
+    for i in np.flatnonzero(needed):
+        y, x = divmod(int(i), walls.shape[1])
+        if covered[y, x]:
+            continue
+        x0, y0, x1, y1 = grow_rect(walls, y, x)
+        y0t, x0t, y1t, x1t = grow_rect(walls.T, x, y)
+        gain=(needed[y0:y1, x0:x1] & ~covered[y0:y1, x0:x1]).sum()
+        gain_t=(needed[y0t:y1t, x0t:x1t] & ~covered[y0t:y1t, x0t:x1t]).sum()
+        if gain_t>gain:
+            x0, y0, x1, y1 = x0t, y0t, x1t, y1t
+        covered[y0:y1, x0:x1]=True
+        rects.append((x0, y0, x1-x0, y1-y0))
+
+    #drop rects whose needed walls are all covered by other rects, smallest first
+    count=np.zeros(walls.shape, dtype=np.int32)
+    for x, y, w, h in rects:
+        count[y:y+h, x:x+w]+=1
+    kept=[]
+    for x, y, w, h in sorted(rects, key=lambda rect: rect[2]*rect[3]):
+        area=(slice(y, y+h), slice(x, x+w))
+        if (count[area][needed[area]]>=2).all():
+            count[area]-=1
+        else:
+            kept.append((x, y, w, h))
+    return sorted(kept, key=lambda rect: (rect[1], rect[0]))
 
 class OccupancyGrid:
-    def __init__(self, game, filename):
+    """
+    Represents the occupancy grid of the maze, where 1 is a wall tile and 0 is a free tile.
+
+    Attributes:
+        game (Game): the game the grid is part of
+        grid (ndarray): uint8 array of shape (tile_height, tile_width)
+        tile_width (int): width of the grid in tiles
+        tile_height (int): height of the grid in tiles
+        width (int): pixel width of the grid
+        height (int): pixel height of the grid
+    """
+    def __init__(self, game, filename=None, grid=None):
         self.game=game 
-        self.grid=[]
-        #make python occupancy grid
-        with open(filename, 'rt') as f:
-                #loads map file and stores wall locations and player location
-            for line in f:
-                row=[]
-                for tile in line:
-                    if tile=='0' or tile=='1':
-                        row.append(int(tile))
-                self.grid.append(row)
-        self.tile_width=len(self.grid[0])
-        self.tile_height=len(self.grid)
+        if grid is None:
+            grid=self.read(filename)
+        self.grid=grid
+        self.tile_width=self.grid.shape[1]
+        self.tile_height=self.grid.shape[0]
         self.width = self.tile_width * TILESIZE
         self.height = self.tile_height * TILESIZE
 
+    @staticmethod
+    def read(filename):
+        """
+        Parses an occupancy grid file, where every '0'/'1' character is a tile and every
+        line a row, into a uint8 array.
+        """
+        with open(filename, 'rb') as f:
+            raw=np.frombuffer(f.read(), dtype=np.uint8)
+        row=np.cumsum(raw==ord('\n'))
+        is_tile=(raw==ord('0')) | (raw==ord('1'))
+        counts=np.bincount(row[is_tile])
+        counts=counts[counts>0]
+        if len(counts)==0 or (counts!=counts[0]).any():
+            raise ValueError("{} is not a rectangular occupancy grid".format(filename))
+        return (raw[is_tile]-ord('0')).reshape(len(counts), counts[0])
+
+    def node_mask(self):
+        """
+        Returns a boolean array marking the tiles that are graph nodes: a node (c, r) sits
+        on the corner shared by four free tiles (c-1..c, r-1..r), so a sprite centered on
+        it fits between the walls.
+        """
+        free=self.grid==0
+        mask=np.zeros_like(free)
+        mask[1:, 1:]=free[1:, 1:] & free[:-1, 1:] & free[1:, :-1] & free[:-1, :-1]
+        return mask
     
-    def make_graph(self):
-        graph={}
-        #generate nodes
-        for r in range(self.tile_height):
-            for c in range(self.tile_width):
-                if self.grid[r][c]==0:
-                    count=0
-                    #special case of top three in corner; look at txt file and try and eliminate corners
-                    for r_prime in range(-1,1):
-                        for c_prime in range(-1,1):
-                            if r+r_prime<0 or c+c_prime<0 or r+r_prime>len(self.grid) or c+c_prime>len(self.grid[0]):
-                                continue
-                            if self.grid[r+r_prime][c+c_prime]==0:
-                                count+=1
-                    
-                    if count==4:
-                        graph[(c,r)]=set()
-
-        #generate edges
-        for valid_node in graph:
-            for r_prime in range(-1, 2): #possible remove diagonals
-                for c_prime in range(-1, 2):
-                    # if c_prime==r_prime:
-                    #     continue
-                    possible_neighbor=(valid_node[0]+c_prime, valid_node[1]+r_prime)
-                    if possible_neighbor in graph:
-                        graph[valid_node].add(possible_neighbor)
+    def wall_rects(self):
+        """
+        Returns the walls of the grid merged into (x, y, width, height) tile rects, see
+        merge_walls.
+        """
+        return merge_walls(self.grid==1)
+
+    def make_graph(self, destinations=None):
+        """
+        Builds the maze graph: nodes from node_mask, 8-connected edges between them and
+        one directed edge per teleport.
+
+        Args:
+            destinations (dict): maps each teleport tile to its destination tile;
+                defaults to game.destinations
+        """
+        if destinations is None:
+            destinations=self.game.destinations
+        mask=self.node_mask()
+        h, w = mask.shape
+        rows, cols = np.nonzero(mask)
+        index=np.full((h, w), -1, dtype=np.int32)
+        index[rows, cols]=np.arange(len(rows), dtype=np.int32)
 
+        #generate edges to the 8 surrounding nodes
+        padded=np.full((h+2, w+2), -1, dtype=np.int32)
+        padded[1:-1, 1:-1]=index
+        src, dst = [], []
+        for r_prime in range(-1, 2):
+            for c_prime in range(-1, 2):
+                if r_prime==0 and c_prime==0:
+                    continue
+                neighbor=padded[1+r_prime:h+1+r_prime, 1+c_prime:w+1+c_prime][rows, cols]
+                valid=neighbor>=0
+                src.append(index[rows, cols][valid])
+                dst.append(neighbor[valid])
 
         #add teleports
-        for teleport in self.game.destinations:
-            s=(teleport[0]+self.game.offset_x, int(teleport[1]+self.game.offset_y-1))
-            e=(self.game.destinations[teleport][0]+self.game.offset_x, int(self.game.destinations[teleport][1]+self.game.offset_y-1))
-            graph[s].add(e)
-            
-        return graph
\ No newline at end of file
+        for teleport in destinations:
+            ends=[]
+            for c, r in (teleport, destinations[teleport]):
+                tile=(c+self.game.offset_x, int(r+self.game.offset_y-1))
+                if not (0<=tile[0]<w and 0<=tile[1]<h and mask[tile[1], tile[0]]):
+                    raise KeyError(tile) #both ends must be nodes, -1 would wrap into another edge
+                ends.append(index[tile[1], tile[0]])
+            src.append(np.array(ends[:1], dtype=np.int32))
+            dst.append(np.array(ends[1:], dtype=np.int32))
+
+        #sort edges by source (dropping duplicates) and compress them into offsets
+        n=len(rows)
+        keys=np.unique(np.concatenate(src).astype(np.int64)*n + np.concatenate(dst))
+        indices=(keys % n).astype(np.int32)
+        offsets=np.zeros(n+1, dtype=np.int32)
+        np.cumsum(np.bincount(keys // n, minlength=n), out=offsets[1:])
+        nodes=np.stack([cols, rows], axis=1).astype(np.int32)
+        return Graph(nodes, index, offsets, indices)
+
+class SpawnSampler:
+    """
+    Samples random free tiles (graph nodes) for teleporting the player back after a
+    kidnap or spawning monsters/items. The tiles far enough from a fixed point (the
+    goal, the player's start) are filtered once and cached, so a sample is a random
+    index into that pool plus a vectorized check against the moving sprites.
+
+    Attributes:
+        tiles (ndarray): int32 array of shape (N, 2) with the (column, row) of every free tile
+        shape (tuple): (rows, columns) of the tile grid the free tiles lie in
+        pools (dict): maps (point, min_distance) to the tiles more than min_distance
+            tiles away from point
+        discs (dict): maps a radius to the boolean disc stamped around avoided points
+    """
+    def __init__(self, graph):
+        self.tiles = graph.nodes
+        self.shape = (int(self.tiles[:, 1].max()) + 1, int(self.tiles[:, 0].max()) + 1) if len(self.tiles) else (0, 0)
+        self.pools = {}
+        self.discs = {}
+
+    def pool(self, point=None, min_distance=0):
+        """
+        Returns the free tiles more than min_distance tiles away from point (all of them
+        if point is None); built on first use.
+        """
+        if point is None:
+            return self.tiles
+        key = (tuple(point), min_distance)
+        if key not in self.pools:
+            far = np.hypot(*(self.tiles - point).T) > min_distance
+            self.pools[key] = self.tiles[far]
+        return self.pools[key]
+
+    def sample(self, pool, avoid=None, min_distance=0, tries=8):
+        """
+        Returns a uniformly random (column, row) from pool that is more than min_distance
+        tiles from every point in avoid, or None if there is no such tile.
+
+        Args:
+            pool (ndarray): candidate tiles, usually from self.pool
+            avoid (ndarray): (M, 2) array of tiles to keep away from (e.g. the monsters)
+            min_distance (float): distance in tiles to keep from every point in avoid
+            tries (int): random picks to try before filtering the whole pool
+        """
+        if len(pool) == 0:
+            return None
+        if avoid is None or len(avoid) == 0:
+            return tuple(pool[randint(0, len(pool) - 1)].tolist())
+        for _ in range(tries):
+            tile = pool[randint(0, len(pool) - 1)]
+            if np.hypot(*(avoid - tile).T).min() > min_distance:
+                return tuple(tile.tolist())
+        #crowded pool: stamp a disc around every point to be avoided and filter the pool at once
+        r = int(min_distance)
+        if r not in self.discs:
+            dy, dx = np.mgrid[-r:r + 1, -r:r + 1]
+            self.discs[r] = np.hypot(dx, dy) <= min_distance
+        disc = self.discs[r]
+        near = np.zeros(self.shape, dtype=bool)
+        for c, row in np.rint(avoid).astype(int).tolist():
+            x0, y0 = max(c - r, 0), max(row - r, 0)
+            x1, y1 = min(c + r + 1, self.shape[1]), min(row + r + 1, self.shape[0])
+            if x0 < x1 and y0 < y1:
+                near[y0:y1, x0:x1] |= disc[y0 - row + r:y1 - row + r, x0 - c + r:x1 - c + r]
+        free = np.flatnonzero(~near[pool[:, 1], pool[:, 0]])
+        if len(free) == 0:
+            return None
+        return tuple(pool[free[randint(0, len(free) - 1)]].tolist())
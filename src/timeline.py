@@ -0,0 +1,219 @@
+'''Timeline'''
+from collections import deque
+import pygame as pg
+from settings import *
+from sprites import Caption, Fade
+
+
+class Timeline:
+    """
+    A queue of timed cutscene steps (typewriter text, fades, waits...). Game.run
+    advances it every frame by the milliseconds the frame took and pauses the
+    simulation while it is active. Steps show things through sprites in
+    game.static_sprites, so a step that only waits costs no drawing at all.
+
+    Attributes:
+        game (Game): the game the cutscenes play in
+        steps (deque): the steps still to run; the first one is running
+        caption (Caption): the text written so far, or None
+        fade (Fade): the color faded over the screen, or None
+        fonts (dict): maps (name, size, bold) to a loaded Font
+    """
+    def __init__(self, game):
+        self.game = game
+        self.steps = deque()
+        self.caption = None
+        self.fade = None
+        self.fonts = {}
+
+    @property
+    def active(self):
+        return len(self.steps) > 0
+
+    def play(self, *steps):
+        '''
+        Queues steps after the ones already queued.
+        '''
+        self.steps.extend(steps)
+
+    def update(self, ms):
+        '''
+        Advances the running steps by ms milliseconds; time left over by a step that
+        finishes goes to the next one.
+        '''
+        while self.steps:
+            step = self.steps[0]
+            if not step.started:
+                step.started = True
+                step.start(self)
+            ms = step.update(self, ms)
+            if ms is None:
+                return
+            self.steps.popleft()
+
+    def key_pressed(self):
+        if self.steps and self.steps[0].started:
+            self.steps[0].key_pressed()
+
+    def font(self, size, name='Arial', bold=True):
+        key = (name, size, bold)
+        if key not in self.fonts:
+            self.fonts[key] = pg.font.SysFont(name, size, bold)
+        return self.fonts[key]
+
+    def get_caption(self):
+        if self.caption is None:
+            self.caption = Caption(self.game)
+        return self.caption
+
+    def clear(self):
+        '''
+        Removes the caption and the fade from the screen.
+        '''
+        if self.caption is not None:
+            self.caption.kill()
+            self.caption = None
+        if self.fade is not None:
+            self.fade.kill()
+            self.fade = None
+
+
+class Step:
+    """
+    A step of a Timeline. update returns None while the step runs and the milliseconds
+    it did not use once it is done.
+    """
+    started = False
+
+    def start(self, timeline):
+        pass
+
+    def update(self, timeline, ms):
+        return ms
+
+    def key_pressed(self):
+        pass
+
+
+class Wait(Step):
+    def __init__(self, duration):
+        self.left = duration
+
+    def update(self, timeline, ms):
+        self.left -= ms
+        return -self.left if self.left <= 0 else None
+
+
+class WaitForKey(Step):
+    '''
+    Waits until a key is pressed while this step runs.
+    '''
+    def __init__(self):
+        self.pressed = False
+
+    def key_pressed(self):
+        self.pressed = True
+
+    def update(self, timeline, ms):
+        return 0 if self.pressed else None
+
+
+class Until(Step):
+    '''
+    Calls each(ms) every frame until done() is true.
+    '''
+    def __init__(self, done, each=None):
+        self.done = done
+        self.each = each
+
+    def update(self, timeline, ms):
+        if self.each is not None:
+            self.each(ms)
+        return 0 if self.done() else None
+
+
+class Call(Step):
+    def __init__(self, function, *args):
+        self.function = function
+        self.args = args
+
+    def update(self, timeline, ms):
+        self.function(*self.args)
+        return ms
+
+
+class Clear(Step):
+    def update(self, timeline, ms):
+        timeline.clear()
+        return ms
+
+
+class Text(Step):
+    '''
+    Shows a whole line of text at once, centered on pos.
+    '''
+    def __init__(self, text, pos, size=20, color=WHITE):
+        self.text = text
+        self.pos = pos
+        self.size = size
+        self.color = color
+
+    def update(self, timeline, ms):
+        timeline.get_caption().write(timeline.font(self.size).render(self.text, True, self.color), self.pos)
+        return ms
+
+
+class Typewriter(Step):
+    '''
+    Writes text one letter every speed milliseconds, starting centered on pos or, if
+    pos is None, right after the text written before.
+    '''
+    def __init__(self, text, pos=None, speed=WORD_TIMESTEP, size=20, color=WHITE):
+        self.text = text
+        self.pos = pos
+        self.speed = speed
+        self.size = size
+        self.color = color
+        self.written = 0
+        self.elapsed = 0
+
+    def start(self, timeline):
+        caption = timeline.get_caption()
+        self.x, self.y = self.pos if self.pos is not None else caption.cursor
+
+    def update(self, timeline, ms):
+        caption = timeline.get_caption()
+        font = timeline.font(self.size)
+        self.elapsed += ms
+        while self.written < len(self.text) and self.elapsed > self.speed:
+            self.elapsed -= self.speed
+            rect = caption.write(font.render(self.text[self.written], True, self.color), (self.x, self.y))
+            self.x += rect.width + 5
+            self.written += 1
+            if self.written == len(self.text):
+                caption.cursor = (rect.right + 10, self.y)
+        if self.written < len(self.text):
+            return None
+        return self.elapsed
+
+
+class FadeTo(Step):
+    '''
+    Fades color over the screen from alpha start to alpha end in duration milliseconds.
+    '''
+    def __init__(self, duration, color=BLACK, start=0, end=255):
+        self.duration = duration
+        self.color = color
+        self.alpha = (start, end)
+        self.elapsed = 0
+
+    def start(self, timeline):
+        if timeline.fade is None:
+            timeline.fade = Fade(timeline.game, self.color)
+        timeline.fade.set_level(self.alpha[0])
+
+    def update(self, timeline, ms):
+        self.elapsed = min(self.elapsed + ms, self.duration)
+        start, end = self.alpha
+        timeline.fade.set_level(start + (end - start) * self.elapsed / self.duration if self.duration else end)
+        return 0 if self.elapsed >= self.duration else None
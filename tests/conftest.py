@@ -0,0 +1,7 @@
+import os
+import sys
+
+#the game's modules are flat files in src/, the map tools sit in src/maps/
+src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, src)
+sys.path.insert(0, os.path.join(src, 'maps'))
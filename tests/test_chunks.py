@@ -0,0 +1,49 @@
+import os
+from types import SimpleNamespace
+import pytest
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame as pg
+from tilemap import ChunkedMap
+
+
+@pytest.fixture(scope='module', autouse=True)
+def display():
+    pg.display.init()
+    pg.display.set_mode((1, 1)) #baked chunks are converted to the display format
+    yield
+    pg.display.quit()
+
+
+def make_map(width, height, tile=32):
+    baked = []
+    def render_area(surface, x, y, w, h):
+        baked.append((x, y))
+    tmxdata = SimpleNamespace(tilewidth=tile, tileheight=tile)
+    return SimpleNamespace(tmxdata=tmxdata, width=width, height=height, render_area=render_area), baked
+
+
+def test_chunks_are_cached_and_evicted_least_recently_used_first():
+    tiled_map, baked = make_map(4 * 64, 64)
+    chunks = ChunkedMap(tiled_map, chunk_size=2, cache_bytes=1)
+    chunk_bytes = chunks.get_chunk(0, 0).get_pitch() * 64
+    chunks = ChunkedMap(tiled_map, chunk_size=2, cache_bytes=2 * chunk_bytes)
+    baked.clear()
+    first = chunks.get_chunk(0, 0)
+    chunks.get_chunk(1, 0)
+    assert chunks.get_chunk(0, 0) is first #cached, and now the most recently used
+    chunks.get_chunk(2, 0) #evicts (1, 0)
+    assert list(chunks.chunks) == [(0, 0), (2, 0)]
+    assert chunks.used_bytes == 2 * chunk_bytes
+    chunks.get_chunk(1, 0)
+    assert list(chunks.chunks) == [(2, 0), (1, 0)]
+    assert baked == [(0, 0), (2, 0), (4, 0), (2, 0)]
+
+
+def test_a_chunk_over_the_cap_is_still_kept_and_edge_chunks_are_clipped():
+    tiled_map, baked = make_map(100, 40)
+    chunks = ChunkedMap(tiled_map, chunk_size=2, cache_bytes=1)
+    chunks.get_chunk(0, 0)
+    edge = chunks.get_chunk(1, 0)
+    assert list(chunks.chunks) == [(1, 0)]
+    assert edge.get_size() == (100 - 64, 40)
+    assert chunks.used_bytes == edge.get_pitch() * edge.get_height()
@@ -0,0 +1,69 @@
+import random
+import pygame as pg
+from settings import TILESIZE
+from tilemap import SpatialHash, TeleportTable
+
+
+def make_sprites(rects):
+    group = pg.sprite.Group()
+    sprites = []
+    for rect in rects:
+        sprite = pg.sprite.Sprite(group)
+        sprite.rect = pg.Rect(rect)
+        sprites.append(sprite)
+    return group, sprites
+
+
+def random_rect(rng, size=800):
+    return (rng.randrange(-50, size), rng.randrange(-50, size), rng.randrange(1, 200), rng.randrange(1, 200))
+
+
+def test_spatial_hash_matches_spritecollide():
+    rng = random.Random(4)
+    group, sprites = make_sprites([random_rect(rng) for i in range(60)])
+    index = SpatialHash(sprites, cell_size=64)
+    probe = pg.sprite.Sprite()
+    for i in range(500):
+        probe.rect = pg.Rect(random_rect(rng))
+        expected = [s for s in sprites if s in pg.sprite.spritecollide(probe, group, False)]
+        assert index.collide(probe.rect) == expected
+        assert set(expected) <= set(index.query(probe.rect))
+
+
+def test_spatial_hash_edges_are_exclusive():
+    group, sprites = make_sprites([(0, 0, 64, 64)])
+    index = SpatialHash(sprites, cell_size=64)
+    assert index.cells == {(0, 0): [0]}
+    assert index.collide(pg.Rect(64, 0, 10, 10)) == []
+    assert index.collide(pg.Rect(63, 63, 10, 10)) == sprites
+
+
+def make_mirrors(tiles):
+    group = pg.sprite.Group()
+    for c, r, w, h in tiles:
+        mirror = pg.sprite.Sprite(group)
+        mirror.rect = pg.Rect(c * TILESIZE, r * TILESIZE, w * TILESIZE, h * TILESIZE)
+        mirror.tp_x, mirror.tp_y = c, r + 10
+    return group
+
+
+def test_teleport_hit_returns_the_first_mirror_in_group_order():
+    #the second mirror comes first in tile order, the first one in group order
+    group = make_mirrors([(3, 2, 1, 1), (2, 2, 1, 1), (6, 6, 2, 1)])
+    table = TeleportTable(group, 10 * TILESIZE, 10 * TILESIZE)
+    mirrors = group.sprites()
+    probe = pg.sprite.Sprite()
+    rng = random.Random(2)
+    for i in range(500):
+        probe.rect = pg.Rect(rng.randrange(-40, 340), rng.randrange(-40, 340), rng.randrange(1, 60), rng.randrange(1, 60))
+        hit = pg.sprite.spritecollide(probe, group, False)
+        assert table.hit(probe.rect) == (mirrors.index(hit[0]) if hit else -1)
+    assert table.hit(pg.Rect(2 * TILESIZE + 16, 2 * TILESIZE, TILESIZE, 8)) == 0
+
+
+def test_teleport_choose_follows_the_exit_distribution():
+    group = make_mirrors([(1, 1, 1, 1), (3, 3, 1, 1), (5, 5, 1, 1)])
+    table = TeleportTable(group, 10 * TILESIZE, 10 * TILESIZE)
+    assert table.choose(1, 0.0) == 0
+    assert table.choose(1, 0.06) == 1 #0.05 for each other mirror, 0.9 for the touched one
+    assert table.choose(1, 0.96) == 2
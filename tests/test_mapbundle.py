@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+import numpy as np
+from mapbundle import load_bundle
+
+MAP = '''<?xml version="1.0" encoding="UTF-8"?>
+<map version="1.2" orientation="orthogonal" width="4" height="3" tilewidth="32" tileheight="32">
+ <objectgroup name="objects">
+  <object id="1" name="player" x="32" y="32" width="32" height="32"/>
+ </objectgroup>
+</map>
+'''
+
+GRID = '''1111
+1001
+1111
+'''
+
+
+def make_level(tmp_path):
+    '''
+    Writes the source files of a tiny level and returns their paths.
+    '''
+    files = {'level.tmx': MAP, 'level.txt': GRID, 'level_tp.txt': '{}'}
+    for name, text in files.items():
+        (tmp_path / name).write_text(text)
+    return [str(tmp_path / name) for name in files]
+
+
+def test_truncated_bundle_is_rebuilt(tmp_path):
+    game = SimpleNamespace(offset_x=1, offset_y=2.5)
+    files = make_level(tmp_path)
+    bundle = load_bundle(game, *files)
+    npz = tmp_path / 'level.npz'
+    data = npz.read_bytes()
+    npz.write_bytes(data[:len(data)//2])
+    rebuilt = load_bundle(game, *files)
+    assert rebuilt.checksum == bundle.checksum
+    assert np.array_equal(rebuilt.grid, bundle.grid)
+    assert rebuilt.objects == bundle.objects
+    assert npz.read_bytes() == data
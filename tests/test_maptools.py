@@ -0,0 +1,41 @@
+import numpy as np
+import maptools
+from tilemap import merge_walls
+
+MAP = '''1111111111
+1P00100001
+1011101T01
+1000000001
+10T1111G01
+1111111111
+'''
+
+
+def test_walls_command_uses_the_game_rects(tmp_path):
+    txt = tmp_path / 'map.txt'
+    txt.write_text(MAP)
+    walls = np.array([[c == '1' for c in line] for line in MAP.split()])
+    assert maptools.wall_rects(str(txt), chunk_rows=2) == merge_walls(walls)
+
+
+def test_png_round_trip(tmp_path):
+    rng = np.random.default_rng(0)
+    walls = rng.random((37, 29)) < 0.4 #a width that is not a whole number of png bytes
+    txt = tmp_path / 'map.txt'
+    txt.write_text(''.join(''.join('1' if wall else '0' for wall in row) + '\n' for row in walls))
+    png = tmp_path / 'map.png'
+    assert maptools.txt_to_png(str(txt), str(png), chunk_rows=8) == (37, 29)
+    back = tmp_path / 'back.txt'
+    assert tuple(maptools.png_to_txt(str(png), str(back), white_becomes='0', black_becomes='1', chunk_rows=5)) == (37, 29)
+    assert back.read_text() == txt.read_text()
+
+
+def test_png_whole_number_scale(tmp_path):
+    from PIL import Image
+    txt = tmp_path / 'map.txt'
+    txt.write_text(MAP)
+    png = tmp_path / 'map.png'
+    assert maptools.txt_to_png(str(txt), str(png), scale=3, chunk_rows=4) == (6, 10)
+    pixels = np.asarray(Image.open(png).convert('L')) > 127
+    walls = np.array([[c == '1' for c in line] for line in MAP.split()])
+    assert np.array_equal(pixels, ~walls.repeat(3, axis=0).repeat(3, axis=1))
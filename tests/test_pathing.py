@@ -0,0 +1,165 @@
+import heapq
+import math
+import random
+import time
+import numpy as np
+from pathing import FlowField, HierarchicalPathfinder, PathService, SearchEngine
+from settings import TILESIZE
+from tilemap import Graph
+
+
+def make_graph(nodes, teleports=()):
+    '''
+    Builds a Graph of 8-connected (column, row) nodes plus directed teleport edges.
+    '''
+    nodes = sorted(set(nodes), key=lambda node: (node[1], node[0]))
+    width = max(c for c, r in nodes) + 1
+    height = max(r for c, r in nodes) + 1
+    index = np.full((height, width), -1, dtype=np.int32)
+    for i, (c, r) in enumerate(nodes):
+        index[r, c] = i
+    lookup = {node: i for i, node in enumerate(nodes)}
+    neighbors = [set() for node in nodes]
+    for i, (c, r) in enumerate(nodes):
+        for dc in (-1, 0, 1):
+            for dr in (-1, 0, 1):
+                if (dc or dr) and (c + dc, r + dr) in lookup:
+                    neighbors[i].add(lookup[(c + dc, r + dr)])
+    for a, b in teleports:
+        neighbors[lookup[a]].add(lookup[b])
+    offsets = np.zeros(len(nodes) + 1, dtype=np.int32)
+    offsets[1:] = np.cumsum([len(n) for n in neighbors])
+    indices = np.array([j for n in neighbors for j in sorted(n)], dtype=np.int32)
+    return Graph(np.array(nodes, dtype=np.int32).reshape(-1, 2), index, offsets, indices)
+
+
+def path_cost(path):
+    return sum(math.hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(path, path[1:]))
+
+
+def dijkstra_cost(graph, start, goal):
+    cost = {start: 0}
+    queue = [(0, start)]
+    while queue:
+        d, node = heapq.heappop(queue)
+        if node == goal:
+            return d
+        if d > cost[node]:
+            continue
+        for neighbor in graph[node]:
+            val = d + math.hypot(neighbor[0] - node[0], neighbor[1] - node[1])
+            if val < cost.get(neighbor, float('inf')):
+                cost[neighbor] = val
+                heapq.heappush(queue, (val, neighbor))
+    return None
+
+
+def test_repair_drops_loop_when_path_doubles_back():
+    #a corridor along row 0 with one extra node under column 1
+    graph = make_graph([(x, 0) for x in range(5)] + [(1, 1)])
+    engine = SearchEngine(graph)
+    previous = [(x, 0) for x in range(5)]
+    #the goal moved back next to the start, so the repair segment runs back along the corridor
+    path = engine.find_path((0, 0), (1, 1), previous)
+    assert path[0] == (0, 0) and path[-1] == (1, 1)
+    assert len(path) == len(set(path)), path
+    assert path == [(0, 0), (1, 0), (2, 0), (1, 1)]
+
+
+def test_repaired_paths_never_repeat_nodes():
+    rng = random.Random(3)
+    nodes = [(c, r) for c in range(14) for r in range(14) if rng.random() > 0.2]
+    graph = make_graph(nodes)
+    engine = SearchEngine(graph)
+    for i in range(300):
+        start, goal = rng.sample(nodes, 2)
+        previous = engine.find_path(start, goal)
+        if len(previous) < 2:
+            continue
+        moved = rng.choice([node for node in nodes if abs(node[0] - goal[0]) <= 2 and abs(node[1] - goal[1]) <= 2])
+        path = engine.find_path(start, moved, previous)
+        assert len(path) == len(set(path)), path
+
+
+def test_search_is_optimal_with_teleports():
+    rng = random.Random(18)
+    nodes = [(c, r) for c in range(16) for r in range(16) if rng.random() > 0.25]
+    teleports = [tuple(rng.sample(nodes, 2)) for i in range(6)]
+    graph = make_graph(nodes, teleports)
+    engine = SearchEngine(graph)
+    for i in range(300):
+        start, goal = rng.sample(nodes, 2)
+        expected = dijkstra_cost(graph, start, goal)
+        path = engine.find_path(start, goal)
+        if expected is None:
+            assert path == [start]
+        else:
+            assert math.isclose(path_cost(path), expected), (start, goal)
+
+
+def test_path_service_survives_a_failing_search(capsys):
+    def find_path(start, goal, previous):
+        if goal is None:
+            raise ValueError('no goal')
+        return [start, goal]
+    service = PathService(find_path)
+    service.submit('a', (0, 0), None)
+    service.submit('b', (0, 0), (1, 1))
+    results = []
+    deadline = time.time() + 5
+    while (service.busy('a') or service.busy('b') or not results) and time.time() < deadline:
+        results += service.poll()
+        time.sleep(0.01)
+    results += service.poll()
+    assert results == [('b', (0, 0), (1, 1), [(0, 0), (1, 1)])]
+    assert not service.busy('a')
+    assert 'no goal' in capsys.readouterr().err
+
+
+def test_hpa_reaches_everything_a_star_does_from_entrances_and_teleports():
+    rng = random.Random(7)
+    nodes = [(c, r) for c in range(24) for r in range(24) if rng.random() > 0.3]
+    teleports = [tuple(rng.sample(nodes, 2)) for i in range(8)]
+    graph = make_graph(nodes, teleports)
+    hpa = HierarchicalPathfinder(graph, cluster_size=6)
+    engine = SearchEngine(graph)
+    starts = [(hpa.xs[i], hpa.ys[i]) for i in hpa.edges] #entrances and teleport ends
+    assert any(a in starts for a, b in teleports)
+    for start in starts:
+        for goal in rng.sample(nodes, 5):
+            if goal == start:
+                continue
+            path, cost = hpa.find_path(start, goal, refine=10**6)
+            expected = dijkstra_cost(graph, start, goal)
+            if expected is None:
+                assert cost == float('inf'), (start, goal)
+                continue
+            assert path[0] == start and path[-1] == goal, (start, goal)
+            assert all(graph.node_id(b) in graph.neighbor_ids(graph.node_id(a)) for a, b in zip(path, path[1:]))
+            assert math.isclose(path_cost(path), cost)
+            assert cost >= expected - 1e-9
+
+
+def test_flow_field_spread_over_ticks_matches_dijkstra():
+    rng = random.Random(11)
+    nodes = [(c, r) for c in range(20) for r in range(20) if rng.random() > 0.3]
+    teleports = [tuple(rng.sample(nodes, 2)) for i in range(5)]
+    graph = make_graph(nodes, teleports)
+    field = FlowField(graph, budget=7)
+    goal = rng.choice(nodes)
+    pos = (goal[0] * TILESIZE, goal[1] * TILESIZE)
+    ticks = 1
+    assert not field.track(pos)
+    while not field.advance():
+        ticks += 1
+    assert ticks > 1 and field.goal == goal
+    for node in nodes:
+        expected = dijkstra_cost(graph, node, goal)
+        if expected is None:
+            assert field.next_step(node) == node
+            continue
+        path = [node]
+        while path[-1] != goal:
+            path.append(field.next_step(path[-1]))
+        assert math.isclose(path_cost(path), expected)
+        assert field.steps_left(node) == len(path) - 1
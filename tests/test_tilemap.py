@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+import os
+import numpy as np
+import pytest
+from tilemap import OccupancyGrid, SpawnSampler, merge_walls
+
+MAPS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'maps')
+
+GRID = '''111111
+100001
+100001
+100001
+111111
+'''
+
+
+def make_grid(tmp_path, text=GRID, destinations=None):
+    filename = tmp_path / 'grid.txt'
+    filename.write_bytes(text.encode())
+    game = SimpleNamespace(offset_x=1, offset_y=2.5, destinations=destinations or {})
+    return OccupancyGrid(game, str(filename))
+
+
+def edges(graph):
+    return {(tuple(graph.nodes[i].tolist()), tuple(graph.nodes[j].tolist()))
+            for i in range(len(graph)) for j in graph.neighbor_ids(i).tolist()}
+
+
+def test_read_parses_rows_and_rejects_ragged_grids(tmp_path):
+    grid = make_grid(tmp_path, GRID.replace('\n', '\r\n'))
+    assert grid.grid.shape == (5, 6)
+    assert grid.grid.dtype == np.uint8
+    assert grid.grid[2].tolist() == [1, 0, 0, 0, 0, 1]
+    with pytest.raises(ValueError):
+        make_grid(tmp_path, GRID + '11\n')
+
+
+def test_make_graph_connects_neighbors_and_teleports(tmp_path):
+    grid = make_grid(tmp_path)
+    graph = grid.make_graph({(1, 1): (3, 2)}) #tile (c, r) is node (c+1, r+1) with the offsets above
+    nodes = {tuple(node) for node in graph.nodes.tolist()}
+    assert nodes == {(c, r) for c in range(2, 5) for r in range(2, 4)}
+    assert np.array_equal(graph.index >= 0, grid.node_mask())
+    neighbors = {(a, b) for a in nodes for b in nodes
+                 if a != b and abs(a[0] - b[0]) <= 1 and abs(a[1] - b[1]) <= 1}
+    assert edges(graph) == neighbors | {((2, 2), (4, 3))}
+    assert np.all(np.diff(graph.offsets) >= 0) and graph.offsets[-1] == len(graph.indices)
+
+
+@pytest.mark.parametrize('destinations', [{(1, 1): (0, 0)}, {(1, 1): (9, 9)}, {(0, 0): (1, 1)}])
+def test_make_graph_rejects_teleports_off_the_graph(tmp_path, destinations):
+    grid = make_grid(tmp_path)
+    with pytest.raises(KeyError):
+        grid.make_graph(destinations)
+
+
+def make_sampler(width=20, height=20):
+    nodes = np.array([(c, r) for r in range(height) for c in range(width)], dtype=np.int32)
+    return SpawnSampler(SimpleNamespace(nodes=nodes))
+
+
+def test_sample_returns_none_for_an_empty_pool():
+    sampler = make_sampler()
+    pool = sampler.pool((10, 10), 100)
+    assert len(pool) == 0
+    assert sampler.sample(pool) is None
+    assert sampler.sample(pool, np.array([[0, 0]]), 3) is None
+
+
+@pytest.mark.parametrize('tries', [0, 8])
+def test_sample_keeps_away_from_a_crowd(tries):
+    sampler = make_sampler()
+    avoid = np.array([(c, r) for c in range(0, 20, 3) for r in range(0, 20, 3) if (c, r) != (18, 18)], dtype=float)
+    pool = sampler.pool()
+    distance = np.array([np.hypot(*(avoid - tile).T).min() for tile in pool])
+    expected = {tuple(tile) for tile in pool[distance > 2].tolist()}
+    assert expected
+    found = {sampler.sample(pool, avoid, 2, tries) for i in range(300)}
+    assert found <= expected
+    assert sampler.sample(pool, np.vstack([avoid, [[18, 18]]]), 2, tries) is None
+
+
+def check_walls(walls, rects):
+    covered = np.zeros_like(walls)
+    for x, y, w, h in rects:
+        assert w > 0 and h > 0
+        assert walls[y:y + h, x:x + w].all(), (x, y, w, h) #only wall tiles
+        covered[y:y + h, x:x + w] = True
+    free = np.pad(~walls, 1)
+    near_free = np.zeros_like(walls)
+    for dy in range(3):
+        for dx in range(3):
+            near_free |= free[dy:dy + walls.shape[0], dx:dx + walls.shape[1]]
+    assert not (walls & near_free & ~covered).any() #every wall a sprite can touch
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_merged_walls_cover_only_walls(seed):
+    walls = np.random.default_rng(seed).random((30, 40)) < 0.6
+    check_walls(walls, merge_walls(walls))
+
+
+def test_merged_walls_of_the_shipped_map():
+    grid = OccupancyGrid(None, os.path.join(MAPS, 'extended_map.txt'))
+    check_walls(grid.grid == 1, grid.wall_rects())
@@ -0,0 +1,42 @@
+from timeline import Call, Timeline, Until, Wait, WaitForKey
+
+
+def test_steps_run_in_order_and_pass_on_leftover_time():
+    log = []
+    timeline = Timeline(None)
+    timeline.play(Wait(100), Call(log.append, 'waited'), Wait(50), Call(log.append, 'again'))
+    timeline.update(60)
+    assert log == [] and timeline.active
+    timeline.update(60) #20 ms of this frame are left after the first wait
+    assert log == ['waited']
+    timeline.update(29)
+    assert log == ['waited']
+    timeline.update(1)
+    assert log == ['waited', 'again'] and not timeline.active
+
+
+def test_wait_for_key_only_counts_presses_while_it_runs():
+    log = []
+    timeline = Timeline(None)
+    timeline.play(Wait(10), WaitForKey(), Call(log.append, 'pressed'))
+    timeline.key_pressed() #before the wait for a key has started
+    timeline.update(20)
+    assert log == [] and timeline.active
+    timeline.update(1000)
+    assert log == []
+    timeline.key_pressed()
+    timeline.update(0)
+    assert log == ['pressed'] and not timeline.active
+
+
+def test_until_runs_each_frame_until_done():
+    frames = []
+    timeline = Timeline(None)
+    timeline.play(Until(lambda: len(frames) == 3, frames.append))
+    for ms in (16, 17, 16):
+        assert timeline.active
+        timeline.update(ms)
+    assert frames == [16, 17, 16] and not timeline.active
+    timeline.play(Call(frames.append, 'queued after'))
+    timeline.update(0)
+    assert frames[-1] == 'queued after'